@@ -1,9 +1,25 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+import sys
 from PyInstaller.utils.hooks import collect_all
 
+# Arquivos estáticos com hash no nome + .gz/.br (app/static/dist e o
+# manifest.json): o executável serve o Bootstrap local com cache immutable
+sys.path.insert(0, SPECPATH)
+from app.assets import build_assets
+build_assets()
+
 datas = [('app/templates', 'app/templates'), ('app/uploads', 'app/uploads'), ('app/static', 'app/static')]
+# Bytecode dos templates já compilado: rode 'python -m app.templating precompile' antes do build
+if os.path.isdir('app/template_cache'):
+    datas += [('app/template_cache', 'app/template_cache')]
 binaries = []
-hiddenimports = []
+# O SQLAlchemy importa o driver pelo nome na URL ('sqlite+aiosqlite'):
+# a análise do PyInstaller não vê esses imports
+hiddenimports = ['aiosqlite', 'sqlalchemy.dialects.sqlite.aiosqlite']
+# Os módulos com CLI (python -m app.schema, app.upload_store, ...) já entram
+# pelos imports do main.py; app.index_advisor é ferramenta de
+# desenvolvimento, roda do código-fonte e fica fora do executável
 tmp_ret = collect_all('uvicorn')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 
@@ -23,23 +39,57 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='ControleDeVeiculos',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=True,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+# ONEDIR=1 pyinstaller ControleDeVeiculos.spec -> pasta dist/ControleDeVeiculos/
+# O executável de arquivo único descompacta tudo numa pasta temporária a
+# cada abertura; na versão em pasta os arquivos já estão no disco e o
+# programa abre bem mais rápido. Sem UPX também: descomprimir as DLLs
+# custa mais na abertura do que o espaço que economiza.
+ONEDIR = os.environ.get('ONEDIR') == '1'
+
+if ONEDIR:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='ControleDeVeiculos',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        name='ControleDeVeiculos',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='ControleDeVeiculos',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
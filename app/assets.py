@@ -0,0 +1,269 @@
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import stat
+import sys
+from pathlib import Path, PurePosixPath
+from typing import Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+# ----------------------------------------------------
+# ARQUIVOS ESTÁTICOS: VERSÃO LOCAL, IMPRESSÃO DIGITAL E PRÉ-COMPRESSÃO
+# O Bootstrap fica em app/static/vendor, no repositório (as oficinas nem
+# sempre têm internet). 'python -m app.assets build' copia app/static para
+# app/static/dist com o hash do conteúdo no nome (style.1a2b3c4d5e.css),
+# gera as versões .gz/.br e o manifest.json. Nos templates,
+# asset_url('style.css') devolve o nome com hash; como o nome muda quando
+# o conteúdo muda, o navegador pode guardar o arquivo "para sempre".
+# O ControleDeVeiculos.spec roda o build antes de empacotar; rodando do
+# código-fonte sem build, os arquivos saem sem hash (no-cache + ETag).
+# ----------------------------------------------------
+if getattr(sys, 'frozen', False):
+    BASE_DIR = Path(sys._MEIPASS)
+else:
+    BASE_DIR = Path(".")
+
+STATIC_DIR = BASE_DIR / "app" / "static"
+DIST_DIR_NAME = "dist"
+DIST_DIR = STATIC_DIR / DIST_DIR_NAME
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+STATIC_URL_PREFIX = "/static/"
+
+HASH_LENGTH = 10
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".json", ".txt", ".map", ".ttf", ".ico"}
+MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"   # pode guardar, mas confere o ETag antes de usar
+
+# Arquivos de terceiros (já no repositório): caminho em app/static -> URL
+# de origem. Para trocar de versão, mude as URLs e rode
+# 'python -m app.assets vendor' (com internet); os arquivos novos vão
+# para o repositório.
+VENDOR_FILES = {
+    "vendor/bootstrap/bootstrap.min.css":
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/bootstrap.min.js":
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/js/bootstrap.min.js",
+    "vendor/bootstrap/popper.min.js":
+        "https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.8/dist/umd/popper.min.js",
+    "vendor/bootstrap-icons/bootstrap-icons.min.css":
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/bootstrap-icons.min.css",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff2":
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff2",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff":
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff",
+}
+
+_CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+try:
+    import brotli  # opcional: sem ele só são gerados os .gz
+except ImportError:
+    brotli = None
+
+
+# --- Template helper ---
+
+_manifest: Optional[Dict[str, str]] = None
+
+
+def load_manifest() -> Dict[str, str]:
+    """Lê (uma vez) o manifest.json do build; vazio se o build não foi feito."""
+    global _manifest
+    if _manifest is None:
+        try:
+            _manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """
+    URL de um arquivo de app/static para os templates:
+    versão com hash (dist/) se houver build, senão o arquivo original.
+    """
+    built = load_manifest().get(path)
+    if built:
+        return STATIC_URL_PREFIX + built
+    return STATIC_URL_PREFIX + path
+
+
+# --- Build ---
+
+def _fingerprinted_name(relative: PurePosixPath, digest: str) -> PurePosixPath:
+    # bootstrap.min.css -> bootstrap.min.<hash>.css
+    return relative.with_name(f"{relative.stem}.{digest[:HASH_LENGTH]}{relative.suffix}")
+
+
+def _rewrite_css_urls(css: str, relative: PurePosixPath, manifest: Dict[str, str]) -> str:
+    """Troca as url(...) relativas do CSS pelos nomes com hash (ex.: fontes dos ícones)."""
+    def _replace(match):
+        quote, target = match.group(1), match.group(2)
+        if target.startswith(("data:", "http:", "https:", "/", "#")):
+            return match.group(0)
+        clean, _, _ = target.partition("?")
+        clean, sep, fragment = clean.partition("#")
+        source = os.path.normpath(str(relative.parent / clean)).replace(os.sep, "/")
+        built = manifest.get(source)
+        if not built:
+            return match.group(0)
+        css_dir = PurePosixPath(DIST_DIR_NAME) / relative.parent
+        new_target = os.path.relpath(built, str(css_dir)).replace(os.sep, "/")
+        if sep:
+            new_target += f"#{fragment}"
+        return f"url({quote}{new_target}{quote})"
+    return _CSS_URL.sub(_replace, css)
+
+
+def _write_compressed(path: Path, data: bytes) -> None:
+    if path.suffix not in COMPRESSIBLE_SUFFIXES or len(data) < MIN_COMPRESS_BYTES:
+        return
+    path.with_name(path.name + ".gz").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(brotli.compress(data, quality=11))
+
+
+def build_assets() -> Dict[str, str]:
+    """Gera app/static/dist (nomes com hash + .gz/.br) e o manifest.json."""
+    global _manifest
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    sources = sorted(
+        p for p in STATIC_DIR.rglob("*")
+        if p.is_file() and DIST_DIR not in p.parents
+    )
+    # CSS por último: as url() dele apontam para arquivos já processados
+    sources.sort(key=lambda p: p.suffix == ".css")
+
+    manifest: Dict[str, str] = {}
+    for source in sources:
+        relative = PurePosixPath(source.relative_to(STATIC_DIR).as_posix())
+        data = source.read_bytes()
+        if source.suffix == ".css":
+            # O hash do CSS considera as referências já reescritas
+            text = _rewrite_css_urls(data.decode("utf-8"), relative, manifest)
+            data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        built = PurePosixPath(DIST_DIR_NAME) / _fingerprinted_name(relative, digest)
+        manifest[str(relative)] = str(built)
+
+        target = STATIC_DIR / built
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        _write_compressed(target, data)
+
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    _manifest = manifest
+    return manifest
+
+
+def vendor_assets() -> None:
+    """Baixa os arquivos de VENDOR_FILES para app/static/vendor."""
+    import urllib.request
+    for relative, url in VENDOR_FILES.items():
+        target = STATIC_DIR / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        target.write_bytes(data)
+        print(f"{relative}: {len(data)} bytes (sha256 {hashlib.sha256(data).hexdigest()[:16]})")
+
+
+# --- Servidor de estáticos com cache ---
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """
+    Accept-Encoding -> {codificação: q}. 'br;q=0' recusa o br; '*' vale
+    para as codificações não citadas.
+    """
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        token, _, params = item.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[token] = quality
+    return accepted
+
+
+def _accepts(accepted: Dict[str, float], encoding: str) -> bool:
+    return accepted.get(encoding, accepted.get("*", 0.0)) > 0
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles com cabeçalhos de cache e pré-compressão:
+    - caminhos em `immutable_prefixes` (nomes com hash) recebem
+      Cache-Control immutable de 1 ano; os demais, no-cache + ETag (304);
+    - se existir <arquivo>.br ou .gz e o navegador aceitar, envia o
+      comprimido, com Content-Encoding e Vary: Accept-Encoding.
+    """
+
+    def __init__(self, *args, immutable_prefixes=(f"{DIST_DIR_NAME}/",), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable_prefixes = tuple(immutable_prefixes)
+
+    async def get_response(self, path: str, scope):
+        posix_path = path.replace(os.sep, "/")
+        response = await self._precompressed_response(path, posix_path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if PurePosixPath(posix_path).suffix in COMPRESSIBLE_SUFFIXES:
+            response.headers["Vary"] = "Accept-Encoding"
+        if posix_path.startswith(self.immutable_prefixes):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+    async def _precompressed_response(self, path: str, posix_path: str, scope):
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        if PurePosixPath(posix_path).suffix not in COMPRESSIBLE_SUFFIXES:
+            return None
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, extension in (("br", ".br"), ("gzip", ".gz")):
+            if not _accepts(accepted, encoding):
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + extension)
+            if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            media_type, _ = mimetypes.guess_type(posix_path)
+            if media_type and media_type.startswith("text/"):
+                media_type += "; charset=utf-8"
+            response.headers["Content-Type"] = media_type or "application/octet-stream"
+            response.headers["Content-Encoding"] = encoding
+            return response
+        return None
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.assets vendor | build
+    parser = argparse.ArgumentParser(description="Arquivos estáticos (Bootstrap local, hash e compressão).")
+    parser.add_argument("command", choices=("vendor", "build"))
+    args = parser.parse_args()
+
+    if args.command == "vendor":
+        vendor_assets()
+    else:
+        manifest = build_assets()
+        extra = ".gz e .br" if brotli is not None else ".gz (instale 'brotli' para gerar .br)"
+        print(f"{len(manifest)} arquivo(s) em {DIST_DIR} com {extra}.")
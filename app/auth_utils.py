@@ -1,19 +1,153 @@
-from passlib.context import CryptContext
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Deque, Dict, Optional
 from fastapi import Request, HTTPException
 from starlette import status
 from app.database import SessionLocal
 from app.database_models import User           
 
 # Configura o algoritmo de hashing (bcrypt é o recomendado)
-pwd_context = CryptContext(schemes=["scrypt"], deprecated="auto")
+# O passlib (e o backend do scrypt) só é carregado no primeiro login,
+# não na abertura do programa
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["scrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica se a senha pura corresponde ao hash salvo."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Gera um hash para a senha pura."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+# ----------------------------------------------------
+# VERIFICAÇÃO DE SENHA ISOLADA E LIMITE DE TENTATIVAS
+# O scrypt gasta bastante CPU e memória de propósito. Em vez de rodar no
+# threadpool que também atende as páginas, ele roda num executor pequeno
+# e com fila limitada: com a fila cheia, o login é recusado na hora.
+# Tentativas erradas são contadas por usuário e por IP numa janela
+# deslizante; quem passa do limite é recusado sem calcular hash nenhum.
+# ----------------------------------------------------
+HASH_WORKERS = 2                # verificações de scrypt em paralelo
+HASH_QUEUE_LIMIT = 8            # verificações esperando na fila (além das em execução)
+
+LOGIN_WINDOW_SECONDS = 15 * 60
+MAX_FAILURES_PER_USER = 5       # senhas erradas por usuário na janela
+MAX_FAILURES_PER_IP = 20        # senhas erradas por IP na janela (vários usuários)
+MAX_TRACKED_KEYS = 10000        # limite de memória dos contadores
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="scrypt")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+class PasswordCheckBusy(Exception):
+    """A fila de verificação de senhas está cheia."""
+
+
+class SlidingWindowLimiter:
+    """Conta eventos por chave nos últimos `window` segundos (em memória)."""
+
+    def __init__(self, limit: int, window: float, max_keys: int = MAX_TRACKED_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, events: Deque[float], now: float) -> None:
+        while events and now - events[0] >= self.window:
+            events.popleft()
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """Segundos até a chave poder tentar de novo, ou None se não está bloqueada."""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if not events:
+                return None
+            self._expire(events, now)
+            if len(events) < self.limit:
+                return None
+            return self.window - (now - events[0])
+
+    def hit(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._events and len(self._events) >= self.max_keys:
+                self._prune(now)
+            events = self._events.setdefault(key, deque())
+            self._expire(events, now)
+            events.append(now)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+    def _prune(self, now: float) -> None:
+        # Remove as chaves sem eventos na janela; se ainda estiver cheio,
+        # descarta as mais antigas
+        for key in list(self._events):
+            self._expire(self._events[key], now)
+            if not self._events[key]:
+                del self._events[key]
+        while len(self._events) >= self.max_keys:
+            del self._events[next(iter(self._events))]
+
+
+user_failures = SlidingWindowLimiter(MAX_FAILURES_PER_USER, LOGIN_WINDOW_SECONDS)
+ip_failures = SlidingWindowLimiter(MAX_FAILURES_PER_IP, LOGIN_WINDOW_SECONDS)
+
+
+def login_retry_after(username: str, client_ip: str) -> Optional[float]:
+    """Caminho rápido: se o usuário ou o IP está bloqueado, quanto falta (s)."""
+    waits = [w for w in (user_failures.retry_after(username.lower()),
+                         ip_failures.retry_after(client_ip)) if w]
+    return max(waits) if waits else None
+
+
+def record_login_attempt(username: str, client_ip: str, success: bool) -> None:
+    if success:
+        user_failures.reset(username.lower())
+    else:
+        user_failures.hit(username.lower())
+        ip_failures.hit(client_ip)
+
+
+@lru_cache(maxsize=None)
+def _dummy_hash() -> str:
+    # Usuário inexistente também paga um scrypt: a resposta leva o mesmo
+    # tempo e não revela quais usuários existem
+    return get_password_hash("usuario-inexistente")
+
+
+def _verify_or_dummy(plain_password: str, hashed_password: Optional[str]) -> bool:
+    if hashed_password is None:
+        verify_password(plain_password, _dummy_hash())
+        return False
+    return verify_password(plain_password, hashed_password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """
+    Verifica a senha no executor dedicado sem travar o event loop.
+    `hashed_password` None (usuário inexistente) sempre retorna False.
+    Levanta PasswordCheckBusy se a fila estiver cheia.
+    """
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordCheckBusy()
+    try:
+        future = _hash_executor.submit(_verify_or_dummy, plain_password, hashed_password)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
 
 def create_admin_user_if_not_exists():
     """Cria o usuário 'admin' padrão se ele não existir (versão SQLAlchemy)."""
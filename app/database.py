@@ -1,8 +1,12 @@
+import os
 import sys
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from app import query_stats
+
 # --- LÓGICA DE CAMINHO ---
 # (Garante que o banco seja criado na raiz do projeto)
 if getattr(sys, 'frozen', False):
@@ -10,21 +14,88 @@ if getattr(sys, 'frozen', False):
 else:
     BASE_DIR = Path(".") 
 
-DB_FILE = BASE_DIR / "oficina.db"
+# OFICINA_DB aponta para outro arquivo (ex.: banco de teste dos benchmarks)
+DB_FILE = Path(os.environ.get("OFICINA_DB") or BASE_DIR / "oficina.db")
 # -------------------------
 
 # 1. Engine de Conexão (como no seu exemplo)
 # A string de conexão aponta para o nosso arquivo de banco
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_FILE}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_FILE}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
     # 'check_same_thread' é necessário apenas para SQLite
-    connect_args={"check_same_thread": False} 
+    connect_args={"check_same_thread": False},
+    # Pool dimensionado para o threadpool do FastAPI (rotas síncronas)
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30,
+)
+
+# --- PERFIL DO SQLITE ---
+# Aplicado em toda conexão nova do pool.
+# - WAL: leituras não ficam bloqueadas por uma escrita em andamento
+# - synchronous=NORMAL: seguro com WAL e bem menos fsync por commit
+# - busy_timeout: espera o lock de escrita em vez de falhar na hora
+# - cache_size negativo é em KiB (64 MiB); mmap_size em bytes (256 MiB)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+event.listen(engine, "connect", _apply_sqlite_pragmas)
+# SQL por requisição, SQL lento e N+1 (app/query_stats.py)
+query_stats.instrument(engine)
+
+# --- ENGINE DO ESCRITOR ÚNICO ---
+# Usada só pela thread de app/db_writer.py. Uma conexão, e cada transação
+# começa com BEGIN IMMEDIATE (pega o lock de escrita logo no início, então
+# leitura+escrita no mesmo lote nunca falha no "upgrade" do lock).
+# O BEGIN implícito do pysqlite é desligado para os SAVEPOINTs funcionarem.
+writer_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
 )
 
+@event.listens_for(writer_engine, "connect")
+def _writer_connect(dbapi_connection, connection_record):
+    _apply_sqlite_pragmas(dbapi_connection, connection_record)
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(writer_engine, "begin")
+def _writer_begin(conn):
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+query_stats.instrument(writer_engine)
+
+# --- ENGINE ASSÍNCRONA (aiosqlite) ---
+# Para as rotas 'async def': as consultas são aguardadas (await) e não
+# travam o event loop do uvicorn. Mesmo perfil de PRAGMAs da engine síncrona.
+# As rotas 'def' (com get_db) já rodam no threadpool do Starlette.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=10, max_overflow=20)
+event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+query_stats.instrument(async_engine.sync_engine)
+
 # 2. Fábrica de Sessões (como no seu exemplo)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+WriterSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # 3. Base Declarativa (como no seu exemplo)
 # Nossas classes de modelo herdarão desta
@@ -32,9 +103,20 @@ Base = declarative_base()
 
 # --- Função helper para obter a sessão ---
 def get_db():
-    """Função helper para gerenciar a sessão do banco de dados."""
+    """
+    Dependência do FastAPI: uma sessão por requisição, fechada no final.
+    Uso nas rotas: db: Session = Depends(get_db)
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Dependência do FastAPI para rotas 'async def': uma AsyncSession por requisição.
+    Uso nas rotas: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, TEXT
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, TEXT, Index
 from sqlalchemy.orm import relationship
 from .database import Base # Importa o 'Base' que acabamos de criar
 
@@ -20,37 +20,92 @@ class Client(Base):
 
     # Relacionamento: Um Cliente tem muitos Veículos
     vehicles = relationship("Vehicle", back_populates="owner", cascade="all, delete-orphan")
+    # Totais dos serviços (tabela de resumo mantida por triggers, só leitura)
+    stats = relationship(
+        "ClientServiceStats", uselist=False, viewonly=True,
+        primaryjoin="Client.id == foreign(ClientServiceStats.client_id)"
+    )
 
 # 3. Modelo de Tabela para Veículos
 class Vehicle(Base):
     __tablename__ = "vehicles"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    model = Column(String(100), nullable=False)
+    model = Column(String(100), nullable=False, index=True) # Ordenação da listagem
     plate = Column(String(20), unique=True, nullable=False, index=True)
     color = Column(String(50))
     year = Column(Integer)
     observations = Column(TEXT)
-    image_url = Column(String(500))
+    image_url = Column(String(500), index=True)  # "alguém ainda usa esta foto?" (upload_store.release)
     
-    # Chave Estrangeira
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    # Chave Estrangeira (indexada: client.vehicles, exclusão em cascata, triggers de resumo)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
 
     # Relacionamentos
     owner = relationship("Client", back_populates="vehicles")
     services = relationship("Service", back_populates="vehicle", cascade="all, delete-orphan")
+    stats = relationship(
+        "VehicleServiceStats", uselist=False, viewonly=True,
+        primaryjoin="Vehicle.id == foreign(VehicleServiceStats.vehicle_id)"
+    )
 
 # 4. Modelo de Tabela para Serviços
 class Service(Base):
     __tablename__ = "services"
     id = Column(Integer, primary_key=True, autoincrement=True)
     description = Column(String(500), nullable=False)
-    start_date = Column(String(20), nullable=False)
+    start_date = Column(Date, nullable=False)   # gravada como AAAA-MM-DD
     status = Column(String(50), nullable=False) # (Ex: "Pendente", "Concluído")
     price = Column(Float, default=0.0)
     notes = Column(TEXT)
 
-    # Chave Estrangeira
+    # Chave Estrangeira (indexada pela 1ª coluna de ix_services_vehicle_start_date)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False)
 
     # Relacionamento
-    vehicle = relationship("Vehicle", back_populates="services")
\ No newline at end of file
+    vehicle = relationship("Vehicle", back_populates="services")
+
+    # Índice para o histórico paginado de um veículo (vehicle_id, start_date, id)
+    __table_args__ = (
+        Index("ix_services_vehicle_start_date", "vehicle_id", "start_date"),
+        # Detalhamento dos relatórios por dia/período
+        Index("ix_services_start_date", "start_date"),
+        # Fila da oficina: serviços de um status, dos mais antigos aos mais novos
+        Index("ix_services_status_start_date", "status", "start_date"),
+    )
+
+# 5. Resumo dos serviços por veículo e por cliente
+# Mantidos pelos triggers de app/service_stats.py a cada INSERT/UPDATE/DELETE
+# em 'services' (e mudança de dono do veículo); a aplicação só lê.
+class VehicleServiceStats(Base):
+    __tablename__ = "vehicle_service_stats"
+    vehicle_id = Column(Integer, primary_key=True)
+    service_count = Column(Integer, nullable=False, server_default="0")
+    open_count = Column(Integer, nullable=False, server_default="0")   # PENDENTE / EM_ANDAMENTO
+    total_billed = Column(Float, nullable=False, server_default="0")
+    last_service_date = Column(String(20))
+
+class ClientServiceStats(Base):
+    __tablename__ = "client_service_stats"
+    client_id = Column(Integer, primary_key=True)
+    service_count = Column(Integer, nullable=False, server_default="0")
+    open_count = Column(Integer, nullable=False, server_default="0")
+    total_billed = Column(Float, nullable=False, server_default="0", index=True)
+    last_service_date = Column(String(20))
+
+# 6. Faturamento por dia e status (base dos relatórios)
+# Mantido pelos triggers de app/revenue_rollup.py; chave (day, status).
+class RevenueDaily(Base):
+    __tablename__ = "revenue_daily"
+    day = Column(String(10), primary_key=True)      # AAAA-MM-DD
+    status = Column(String(50), primary_key=True)
+    service_count = Column(Integer, nullable=False, server_default="0")
+    revenue = Column(Float, nullable=False, server_default="0")
+
+# 7. Versão de cada entidade para o cache de páginas (app/page_cache.py)
+# Incrementada pelos triggers de clients/vehicles/services na mesma
+# transação da alteração: todos os processos (uvicorn --workers) leem
+# daqui, então uma gravação em um invalida as páginas de todos.
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    entity = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, server_default="0")
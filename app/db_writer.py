@@ -0,0 +1,132 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from app.database import WriterSessionLocal
+
+# ----------------------------------------------------
+# ESCRITOR ÚNICO COM GROUP COMMIT
+# O SQLite só aceita um escritor por vez. Em vez de cada rota abrir a sua
+# transação (e disputar o lock / esperar o fsync sozinha), as rotas mandam
+# a alteração para uma thread dedicada. A thread junta o que chegar em
+# poucos milissegundos num único commit; cada alteração roda num SAVEPOINT,
+# então o erro de uma não derruba as outras do mesmo lote.
+# ----------------------------------------------------
+GROUP_COMMIT_WINDOW = 0.005   # segundos esperando mais alterações para o lote
+MAX_BATCH_SIZE = 64           # alterações por commit
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """Fila de alterações processada por uma única thread escritora."""
+
+    def __init__(self, session_factory, window: float = GROUP_COMMIT_WINDOW,
+                 max_batch: int = MAX_BATCH_SIZE):
+        self._session_factory = session_factory
+        self._window = window
+        self._max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name="db-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Agenda `fn(session, *args)` na thread escritora.
+        O Future recebe o retorno de `fn` ou a exceção que ela levantou.
+        `fn` deve devolver valores simples (ids etc.), não objetos do ORM.
+        """
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((future, fn, args))
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Versão bloqueante, para rotas síncronas (já rodam no threadpool)."""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Versão para rotas async: espera o resultado sem travar o event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stop(self) -> None:
+        """Processa o que já está na fila e encerra a thread."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    # --- Thread escritora ---
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 \
+                        else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stop:
+                return
+
+    def _commit_batch(self, batch) -> None:
+        outcomes = []
+        session = self._session_factory()
+        try:
+            for future, fn, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = session.begin_nested()
+                try:
+                    value = fn(session, *args)
+                    savepoint.commit()
+                    outcomes.append((future, value, None))
+                except BaseException as e:
+                    savepoint.rollback()
+                    outcomes.append((future, None, e))
+            session.commit()
+        except Exception as e:
+            # O commit do lote falhou: nenhuma alteração foi gravada
+            session.rollback()
+            print(f"Erro no commit do lote de escrita: {e}")
+            errors = {id(future): error for future, _, error in outcomes}
+            outcomes = [
+                (future, None, errors.get(id(future)) or e)
+                for future, _, _ in batch if not future.cancelled()
+            ]
+        finally:
+            session.close()
+
+        for future, value, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+
+db_writer = DatabaseWriter(WriterSessionLocal)
@@ -0,0 +1,161 @@
+import csv
+import io
+import tempfile
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, exists
+from starlette.responses import StreamingResponse
+
+from app.database import SessionLocal
+from app.database_models import Service
+from app.models.service import ServiceStatus
+
+# ----------------------------------------------------
+# EXPORTAÇÃO EM STREAMING (CSV / XLSX)
+# As linhas vêm de um cursor do banco lido em blocos (yield_per) e são
+# escritas conforme chegam; nada é montado inteiro na memória.
+# ----------------------------------------------------
+EXPORT_BATCH_ROWS = 1000          # linhas por bloco lido do cursor / enviado
+XLSX_READ_CHUNK = 64 * 1024
+
+EXPORT_FORMATS = ("csv", "xlsx")
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class ExportFilters:
+    """Filtros comuns às exportações: período (start_date do serviço) e status."""
+
+    def __init__(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                 status: Optional[str] = None):
+        self.date_from = _parse_date(date_from, "date_from")
+        self.date_to = _parse_date(date_to, "date_to")
+        self.status = None
+        if status:
+            try:
+                self.status = ServiceStatus(status).value
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Status inválido: {status}")
+
+    @property
+    def active(self) -> bool:
+        return bool(self.date_from or self.date_to or self.status)
+
+    def service_conditions(self) -> list:
+        """Condições sobre a tabela 'services'."""
+        conditions = []
+        if self.date_from:
+            conditions.append(Service.start_date >= self.date_from)
+        if self.date_to:
+            conditions.append(Service.start_date <= self.date_to)
+        if self.status:
+            conditions.append(Service.status == self.status)
+        return conditions
+
+    def has_matching_service(self, vehicle_id_column):
+        """EXISTS de um serviço do veículo que atenda aos filtros."""
+        return exists().where(and_(Service.vehicle_id == vehicle_id_column,
+                                   *self.service_conditions()))
+
+
+def fetch_rows(db, statement):
+    """Executa o SELECT lendo o cursor em blocos (server-side) em vez de .all()."""
+    return db.execute(statement.execution_options(yield_per=EXPORT_BATCH_ROWS))
+
+
+def _parse_date(value: Optional[str], field: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Data inválida em '{field}' (use AAAA-MM-DD).")
+
+
+def _csv_value(value: Any) -> Any:
+    # Números decimais no padrão brasileiro para abrir direto no Excel
+    if isinstance(value, float):
+        return f"{value:.2f}".replace(".", ",")
+    return "" if value is None else value
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """Gera o CSV (separador ';', UTF-8 com BOM) em blocos de EXPORT_BATCH_ROWS linhas."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    buffer.write("\ufeff")  # BOM: o Excel reconhece o UTF-8
+    writer.writerow(header)
+    # O cabeçalho sai imediatamente, antes da primeira consulta terminar
+    yield buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    count = 0
+    for row in rows:
+        writer.writerow([_csv_value(v) for v in row])
+        count += 1
+        if count % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx(header: Sequence[str], rows: Iterable[Sequence[Any]], title: str) -> Iterator[bytes]:
+    """
+    Gera o XLSX com o openpyxl em modo write-only (as linhas vão para disco,
+    não para a memória). O formato é um ZIP, então o arquivo só pode ser
+    enviado depois de fechado; ele é montado num temporário e lido em blocos.
+    """
+    import openpyxl  # carregado só quando alguém exporta em XLSX
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    sheet.append(list(header))
+    for row in rows:
+        sheet.append(list(row))
+
+    with tempfile.TemporaryFile() as out:
+        workbook.save(out)
+        out.seek(0)
+        while True:
+            chunk = out.read(XLSX_READ_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_export(
+    fmt: str,
+    filename: str,
+    header: Sequence[str],
+    query_rows: Callable[[Any], Iterable[Sequence[Any]]],
+) -> StreamingResponse:
+    """
+    Monta a StreamingResponse da exportação. `query_rows(db)` deve devolver
+    um iterável de linhas; a sessão fica aberta só enquanto o arquivo é enviado.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: {fmt}")
+
+    def _rows():
+        db = SessionLocal()
+        try:
+            yield from query_rows(db)
+        finally:
+            db.close()
+
+    if fmt == "csv":
+        body = iter_csv(header, _rows())
+        media_type = "text/csv; charset=utf-8"
+    else:
+        body = iter_xlsx(header, _rows(), title=filename)
+        media_type = XLSX_MEDIA_TYPE
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
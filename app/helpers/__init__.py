@@ -1,3 +1,7 @@
 from .formatters import format_brl_price, format_brl_date, parse_brl_price
+from .pagination import Page, keyset_paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
-__all__ = ["format_brl_price", "format_brl_date", "parse_brl_price"]
\ No newline at end of file
+__all__ = [
+    "format_brl_price", "format_brl_date", "parse_brl_price",
+    "Page", "keyset_paginate", "DEFAULT_PAGE_SIZE", "MAX_PAGE_SIZE",
+]
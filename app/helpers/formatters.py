@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Union
 
 def format_brl_price(value: float):
@@ -9,10 +9,18 @@ def format_brl_price(value: float):
     return formatted.replace(",", "X").replace(".", ",").replace("X", ".")
 
 
-def format_brl_date(value: datetime):
-    #Formata datas para o padrão brasileiro (DD/MM/YYYY HH:MM).
+def format_brl_date(value: Union[datetime, date, str]):
+    #Formata datas para o padrão brasileiro (DD/MM/YYYY HH:MM, ou só DD/MM/YYYY para date).
+    #Texto ISO (AAAA-MM-DD, como nas tabelas de resumo) vale como date.
     if not value:
         return ""
+    if isinstance(value, str):
+        try:
+            value = date.fromisoformat(value[:10])
+        except ValueError:
+            return value
+    if not isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y")
     return value.strftime("%d/%m/%Y %H:%M")
 
 
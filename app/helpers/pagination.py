@@ -0,0 +1,137 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import Date, DateTime, and_, or_
+
+# Limites de tamanho de página usados pelas listagens
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class Page:
+    """Uma página de resultados paginada por cursor (keyset)."""
+    items: List[Any] = field(default_factory=list)
+    limit: int = DEFAULT_PAGE_SIZE
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Garante que o tamanho de página fique entre 1 e MAX_PAGE_SIZE."""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Serializa os valores da chave de ordenação num cursor opaco para a URL."""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    """Desfaz o encode_cursor. Cursores inválidos são tratados como ausentes."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _cursor_values(columns, values: Optional[list]) -> Optional[list]:
+    """
+    Confere o cursor com as colunas e converte as datas (que vão como
+    texto ISO no JSON) de volta para date/datetime. Inválido => None.
+    """
+    if values is None or len(values) != len(columns):
+        return None
+    converted = []
+    for column, value in zip(columns, values):
+        column_type = getattr(column, "type", None)
+        try:
+            if isinstance(column_type, DateTime) and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column_type, Date) and isinstance(value, str):
+                value = date.fromisoformat(value)
+        except ValueError:
+            return None
+        converted.append(value)
+    return converted
+
+
+def _seek_condition(columns, values, forward: bool):
+    """
+    Monta a condição "linha depois de (values)" na ordem das colunas.
+    Ex.: (name, id) > ('Ana', 7)  =>  name > 'Ana' OR (name = 'Ana' AND id > 7)
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equals = [columns[j] == values[j] for j in range(i)]
+        step = column > values[i] if forward else column < values[i]
+        clauses.append(and_(*equals, step))
+    return or_(*clauses)
+
+
+def keyset_paginate(
+    query,
+    columns: Sequence,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    descending: bool = False,
+) -> Page:
+    """
+    Pagina uma query do SQLAlchemy por cursor (keyset) sobre `columns`.
+
+    A última coluna deve ser única (normalmente o id) para desempatar.
+    Em vez de OFFSET, cada página busca `limit + 1` linhas a partir da chave
+    da última linha vista, então o custo não cresce com o tamanho da tabela.
+    """
+    limit = clamp_page_size(limit)
+    after_values = _cursor_values(columns, decode_cursor(after))
+    before_values = _cursor_values(columns, decode_cursor(before))
+
+    # "before" navega para trás: invertemos a ordem e depois revertemos a lista
+    backwards = before_values is not None and after_values is None
+    forward = descending == backwards
+
+    if backwards:
+        query = query.filter(_seek_condition(columns, before_values, forward))
+    elif after_values is not None:
+        query = query.filter(_seek_condition(columns, after_values, forward))
+
+    order = [c.asc() if forward else c.desc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after_values is not None, has_more
+
+    def _key(row):
+        return [getattr(row, c.key) for c in columns]
+
+    page = Page(items=rows, limit=limit)
+    if rows and has_next:
+        page.next_cursor = encode_cursor(_key(rows[-1]))
+    if rows and has_prev:
+        page.prev_cursor = encode_cursor(_key(rows[0]))
+    return page
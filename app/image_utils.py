@@ -0,0 +1,158 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+# ----------------------------------------------------
+# MINIATURAS DAS FOTOS DOS VEÍCULOS
+# Para cada foto enviada são geradas versões menores (lista e detalhes),
+# em WebP e JPEG, numa thread em segundo plano. Os templates usam
+# photo_url/photo_srcset, que caem na foto original enquanto (ou se)
+# a miniatura não existir.
+# ----------------------------------------------------
+UPLOAD_ROOT = Path("app/uploads")
+UPLOAD_URL_PREFIX = "/uploads/"
+BLOB_DIR = UPLOAD_ROOT / "blobs"   # fotos por conteúdo (app/upload_store.py)
+DERIVED_DIR_NAME = "derived"
+
+# nome -> (largura, altura) máximas. 'thumb' cobre a foto de 60x40 da lista
+# em telas de alta densidade; 'md' é a foto da página de detalhes.
+PHOTO_SIZES = {
+    "thumb": (160, 120),
+    "md": (960, 720),
+}
+PHOTO_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}),
+                 "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbs")
+_known_derivatives = set()   # caminhos que já sabemos existir (evita stat repetido)
+
+
+def derivative_path(original: Path, size: str, fmt: str) -> Path:
+    """Caminho da versão `size` no formato `fmt` (ex.: derived/1_foto.png.thumb.webp)."""
+    return original.parent / DERIVED_DIR_NAME / f"{original.name}.{size}.{fmt}"
+
+
+def url_to_path(image_url: Optional[str]) -> Optional[Path]:
+    """
+    Converte '/uploads/...' no caminho do arquivo. URLs externas retornam None.
+    A URL pode vir de uma planilha importada: '..', '.', trechos vazios,
+    barra invertida e nomes de unidade (C:) também retornam None, para o
+    caminho nunca sair de UPLOAD_ROOT.
+    """
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    parts = image_url[len(UPLOAD_URL_PREFIX):].split("/")
+    for part in parts:
+        if part in ("", ".", "..") or "\\" in part or ":" in part or "\0" in part:
+            return None
+    return UPLOAD_ROOT.joinpath(*parts)
+
+
+def path_to_url(path: Path) -> str:
+    return UPLOAD_URL_PREFIX + path.relative_to(UPLOAD_ROOT).as_posix()
+
+
+def generate_derivatives(original: Path, overwrite: bool = False) -> List[Path]:
+    """Gera as versões reduzidas de uma foto. Retorna os arquivos criados."""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        print("Pillow não instalado: miniaturas desativadas.")
+        return []
+
+    created = []
+    try:
+        with Image.open(original) as source:
+            source = ImageOps.exif_transpose(source)
+            if source.mode not in ("RGB", "L"):
+                source = source.convert("RGB")
+            for size, box in PHOTO_SIZES.items():
+                resized = source.copy()
+                resized.thumbnail(box, Image.LANCZOS)
+                for fmt, (pil_format, options) in PHOTO_FORMATS.items():
+                    target = derivative_path(original, size, fmt)
+                    if target.exists() and not overwrite:
+                        continue
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = target.with_name(target.name + ".tmp")
+                    resized.save(tmp, pil_format, **options)
+                    tmp.replace(target)
+                    created.append(target)
+    except Exception as e:
+        print(f"Erro ao gerar miniaturas de {original}: {e}")
+    if created:
+        # As páginas guardadas apontavam para a foto original
+        from app.page_cache import bump
+        bump("photos")
+    return created
+
+
+def forget_derivatives(original: Path) -> None:
+    """Esquece as miniaturas conhecidas da foto (recriadas ou apagadas)."""
+    for size in PHOTO_SIZES:
+        for fmt in PHOTO_FORMATS:
+            _known_derivatives.discard(derivative_path(original, size, fmt))
+
+
+def schedule_derivatives(image_url: Optional[str]) -> None:
+    """
+    Agenda a geração das miniaturas da foto em segundo plano.
+    Sempre recria: um upload novo pode ter substituído um arquivo de mesmo nome.
+    """
+    original = url_to_path(image_url)
+    if original is not None:
+        forget_derivatives(original)
+        _executor.submit(generate_derivatives, original, True)
+
+
+def photo_url(image_url: Optional[str], size: str, fmt: str = "jpg") -> Optional[str]:
+    """URL da versão reduzida, ou a URL original se ela ainda não existir."""
+    original = url_to_path(image_url)
+    if original is None:
+        return image_url
+    target = derivative_path(original, size, fmt)
+    if target in _known_derivatives or target.exists():
+        _known_derivatives.add(target)
+        return path_to_url(target)
+    return image_url
+
+
+def photo_srcset(image_url: Optional[str], fmt: str = "jpg") -> str:
+    """Atributo srcset com as versões disponíveis ('' se não houver nenhuma)."""
+    original = url_to_path(image_url)
+    if original is None:
+        return ""
+    entries = []
+    for size, (width, _) in PHOTO_SIZES.items():
+        url = photo_url(image_url, size, fmt)
+        if url != image_url:
+            entries.append(f"{url} {width}w")
+    return ", ".join(entries)
+
+
+def backfill(directory: Path = BLOB_DIR, overwrite: bool = False) -> int:
+    """
+    Gera as miniaturas que faltam para todas as fotos de `directory` e das
+    subpastas (blobs/ab/cd/...), sem entrar nas pastas de miniaturas.
+    """
+    count = 0
+    for original in sorted(directory.rglob("*")):
+        if (not original.is_file() or DERIVED_DIR_NAME in original.relative_to(directory).parts
+                or original.name.startswith(".")):   # temporários de upload em andamento
+            continue
+        created = generate_derivatives(original, overwrite=overwrite)
+        if created:
+            count += 1
+            print(f"{original.name}: {len(created)} arquivo(s) gerado(s)")
+    return count
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.image_utils [--overwrite] [diretório]
+    parser = argparse.ArgumentParser(description="Gera miniaturas das fotos já enviadas.")
+    parser.add_argument("directory", nargs="?", default=str(BLOB_DIR))
+    parser.add_argument("--overwrite", action="store_true", help="Recria as miniaturas existentes.")
+    args = parser.parse_args()
+    total = backfill(Path(args.directory), overwrite=args.overwrite)
+    print(f"Miniaturas geradas para {total} foto(s).")
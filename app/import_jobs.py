@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.database import SessionLocal
+from app.import_utils import ImportResult, import_vehicles_file
+
+# ----------------------------------------------------
+# JOBS DE IMPORTAÇÃO EM SEGUNDO PLANO
+# O upload só grava o arquivo e agenda o job; um pool pequeno de threads
+# faz a leitura e os INSERTs. O progresso fica em memória e é consultado
+# pela rota /imports/{job_id}.
+# ----------------------------------------------------
+IMPORT_WORKERS = 2
+MAX_FINISHED_JOBS = 100   # jobs terminados guardados para consulta
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+_jobs: Dict[str, "ImportJob"] = {}
+_jobs_lock = threading.Lock()
+
+
+class ImportJob:
+    """Estado de uma importação agendada."""
+
+    def __init__(self, path: Path, filename: str, username: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.filename = filename
+        self.username = username
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.result = ImportResult()
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def to_dict(self) -> dict:
+        """Resumo serializável (JSON) do job, com a vazão em linhas/s."""
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "processed": self.result.processed,
+            "inserted": self.result.inserted,
+            "skipped": self.result.skipped,
+            "duplicates": self.result.duplicates,
+            "failed": self.result.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.result.processed / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def _run(job: ImportJob) -> None:
+    if job.is_cancelled():
+        job.status = CANCELLED
+        job.finished_at = time.time()
+        job.path.unlink(missing_ok=True)
+        return
+
+    job.status = RUNNING
+    job.started_at = time.time()
+    db = SessionLocal()
+    try:
+        import_vehicles_file(db, job.path, result=job.result, cancelled=job.is_cancelled)
+        if job.is_cancelled():
+            job.status = CANCELLED
+        elif job.result.inserted == 0 and (job.result.skipped or job.result.failed):
+            # Nada entrou e houve linhas inválidas: separador, colunas ou ids
+            # de cliente errados. Só placas já cadastradas (reenvio do mesmo
+            # arquivo) não é erro: termina DONE com 0 importados.
+            job.status = FAILED
+            job.error = (f"Nenhum veículo importado: {job.result.skipped} linha(s) ignorada(s), "
+                         f"{job.result.failed} com erro e {job.result.duplicates} com placa já "
+                         f"cadastrada. Confira o separador, a ordem das colunas e os ids de cliente.")
+        else:
+            job.status = DONE
+    except Exception as e:
+        job.status = FAILED
+        job.error = str(e)
+        print(f"Erro na importação {job.id}: {e}")
+    finally:
+        db.close()
+        job.finished_at = time.time()
+        job.path.unlink(missing_ok=True)
+
+
+def _prune_finished() -> None:
+    """Descarta os jobs terminados mais antigos (chamar com o lock)."""
+    finished = sorted((j for j in _jobs.values() if j.finished), key=lambda j: j.created_at)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job.id]
+
+
+def submit_import(path: Path, filename: str, username: Optional[str] = None) -> ImportJob:
+    """Agenda a importação do arquivo (já gravado em disco) e retorna o job."""
+    job = ImportJob(path, filename, username)
+    with _jobs_lock:
+        _prune_finished()
+        _jobs[job.id] = job
+    _executor.submit(_run, job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[ImportJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs() -> List[ImportJob]:
+    with _jobs_lock:
+        return sorted(_jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+
+def shutdown_import_jobs() -> None:
+    """Cancela os jobs pendentes e espera os que estão rodando pararem."""
+    for job in list_jobs():
+        job.cancel()
+    _executor.shutdown(wait=True)
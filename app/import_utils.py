@@ -0,0 +1,199 @@
+import csv
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Set
+
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from app.database_models import Client, Vehicle
+from app.db_writer import db_writer
+from app.image_utils import url_to_path
+
+# ----------------------------------------------------
+# IMPORTAÇÃO DE VEÍCULOS EM STREAMING
+# O arquivo enviado é copiado em blocos para o disco, lido linha a linha
+# (openpyxl read-only ou csv) e gravado em lotes de tamanho fixo. Cada
+# lote vai para a thread escritora (app/db_writer.py), como as gravações
+# dos formulários: a importação não disputa o lock de escrita com elas.
+# O uso de memória não depende do tamanho da planilha.
+# ----------------------------------------------------
+IMPORT_CHUNK_SIZE = 1000          # linhas por INSERT (um SAVEPOINT na thread escritora)
+SPOOL_CHUNK_BYTES = 1024 * 1024   # bloco de cópia do upload para o disco
+
+# .xls (Excel 97-2003) não: o openpyxl só lê .xlsx
+IMPORT_EXTENSIONS = ('.xlsx', '.csv')
+CSV_DELIMITERS = (";", ",", "\t")
+
+
+@dataclass
+class ImportResult:
+    """Contadores de uma importação."""
+    processed: int = 0   # linhas lidas do arquivo
+    inserted: int = 0    # veículos gravados
+    skipped: int = 0     # linhas ignoradas (vazias, cliente inválido)
+    duplicates: int = 0  # placas já cadastradas (puladas pelo INSERT OR IGNORE)
+    failed: int = 0      # lotes/linhas que deram erro no banco
+
+
+async def spool_upload(upload, suffix: str) -> Path:
+    """
+    Copia o UploadFile para um arquivo temporário em blocos, sem segurar
+    o arquivo inteiro na memória e sem bloquear o event loop.
+    Quem chama é responsável por apagar o arquivo.
+    """
+    fd, name = tempfile.mkstemp(prefix="import_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_BYTES)
+                if not chunk:
+                    break
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.unlink(name)
+        raise
+    return Path(name)
+
+
+def iter_xlsx_rows(path: Path) -> Iterator[Sequence[Any]]:
+    """Lê as linhas da planilha (sem o cabeçalho) no modo read-only do openpyxl."""
+    import openpyxl  # só a rota de importação precisa do openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(min_row=2, values_only=True)
+    finally:
+        workbook.close()
+
+
+def csv_delimiter(header: str) -> str:
+    """
+    Separador do CSV pelo cabeçalho: o que mais aparece entre ';', ',' e
+    tab ('1.500,75' do Excel pt-BR não aparece no cabeçalho). Sem nenhum, ','.
+    """
+    counts = {delimiter: header.count(delimiter) for delimiter in CSV_DELIMITERS}
+    best = max(CSV_DELIMITERS, key=lambda d: counts[d])
+    return best if counts[best] else ","
+
+
+def iter_csv_rows(path: Path) -> Iterator[Sequence[Any]]:
+    """Lê as linhas de um CSV (sem o cabeçalho). Aceita ';', ',' ou tab como separador."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        delimiter = csv_delimiter(f.readline())
+        f.seek(0)
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)
+        for row in reader:
+            yield [value if value != "" else None for value in row]
+
+
+def iter_import_rows(path: Path) -> Iterator[Sequence[Any]]:
+    """Escolhe o leitor pela extensão do arquivo."""
+    if path.suffix.lower() == ".csv":
+        return iter_csv_rows(path)
+    return iter_xlsx_rows(path)
+
+
+def map_vehicle_row(
+    row: Sequence[Any], valid_client_ids: Set[int], fallback_index: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Converte uma linha da planilha no dicionário de colunas de 'vehicles'.
+    Colunas: client_id, modelo, placa, cor, ano, observações, image_url.
+    Retorna None se a linha deve ser ignorada.
+    """
+    if len(row) < 4 or not row[0]:
+        return None
+    try:
+        client_id = int(row[0])
+    except (ValueError, TypeError):
+        return None
+
+    if client_id not in valid_client_ids:
+        return None
+
+    plate = str(row[2]).upper() if row[2] else f"S/PLACA-{fallback_index}"
+    return {
+        "client_id": client_id,
+        "model": str(row[1]) if row[1] else "N/A",
+        "plate": plate,
+        "color": str(row[3]) if row[3] else "N/A",
+        "year": int(row[4]) if len(row) > 4 and row[4] and str(row[4]).isdigit() else 2000,
+        "observations": str(row[5]) if len(row) > 5 and row[5] else None,
+        "image_url": _imported_image_url(row[6]) if len(row) > 6 and row[6] else None,
+    }
+
+
+def _imported_image_url(value: Any) -> Optional[str]:
+    """
+    A URL da foto vem da planilha (não confiável): só aceita http(s) ou um
+    caminho de /uploads/ que não sai da pasta de fotos. O resto vira None.
+    """
+    url = str(value).strip()
+    if url.lower().startswith(("http://", "https://")):
+        return url
+    return url if url_to_path(url) is not None else None
+
+
+def _insert_chunk(chunk, result: ImportResult) -> None:
+    """Grava um lote com um único executemany, na thread escritora."""
+    # 'OR IGNORE' pula placas já cadastradas sem derrubar o lote inteiro
+    statement = insert(Vehicle.__table__).prefix_with("OR IGNORE")
+    try:
+        inserted = db_writer.run(lambda session: session.execute(statement, chunk).rowcount)
+    except Exception as e:
+        print(f"Erro ao gravar lote da importação: {e}")
+        result.failed += len(chunk)
+        return
+    result.inserted += inserted
+    result.duplicates += len(chunk) - inserted
+
+
+def import_vehicle_rows(
+    db,
+    rows: Iterable[Sequence[Any]],
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    result: Optional[ImportResult] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> ImportResult:
+    """
+    Importa as linhas em lotes de `chunk_size`; cada lote é gravado (e
+    confirmado) pela thread escritora. `db` só lê os ids de cliente.
+    `result` é atualizado durante a importação (permite acompanhar o progresso)
+    e `cancelled` é consultado periodicamente; se retornar True, a importação
+    para e os lotes já gravados permanecem.
+    """
+    result = result if result is not None else ImportResult()
+    valid_client_ids = {row.id for row in db.query(Client.id)}
+
+    chunk = []
+    for row in rows:
+        # Checa o cancelamento a cada `chunk_size` linhas lidas
+        if cancelled is not None and result.processed % chunk_size == 0 and cancelled():
+            return result
+        result.processed += 1
+        values = map_vehicle_row(row, valid_client_ids, result.inserted + len(chunk))
+        if values is None:
+            result.skipped += 1
+            continue
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            _insert_chunk(chunk, result)
+            chunk = []
+    if chunk:
+        _insert_chunk(chunk, result)
+    return result
+
+
+def import_vehicles_file(
+    db,
+    path: Path,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    result: Optional[ImportResult] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+) -> ImportResult:
+    """Importa um arquivo .xlsx ou .csv já gravado em disco."""
+    return import_vehicle_rows(db, iter_import_rows(path), chunk_size, result, cancelled)
@@ -0,0 +1,280 @@
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+
+from app import revenue_rollup
+from app.database_models import Client, Service, Vehicle
+from app.export_utils import ExportFilters
+from app.routers import auth, clients, reports, services, vehicles
+from app.search_index import search
+from app.service_stats import OPEN_STATUSES
+
+# ----------------------------------------------------
+# CONSULTOR DE ÍNDICES (EXPLAIN QUERY PLAN)
+# Roda as consultas que as rotas fazem (as mesmas funções dos roteadores,
+# com ids reais do banco), captura o SQL que chega ao SQLite, inclusive as cargas
+# preguiçosas e as da exclusão em cascata, e pede o EXPLAIN QUERY PLAN de
+# cada um. "SCAN <tabela>" sem índice = leitura da tabela inteira.
+# 'python -m app.index_advisor' termina com código 1 se achar alguma, para
+# pegar a regressão antes de ir para as oficinas. As exclusões rodam numa
+# transação desfeita no final (nada é gravado).
+# Cada rota do app precisa estar num Check (routes=) ou em
+# UNCHECKED_ROUTES; uma rota nova sem nenhum dos dois também dá código 1.
+# ----------------------------------------------------
+
+# "SCAN services" / "SCAN s" (sem "USING ... INDEX"): tabela inteira
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+_TEMP_SORT = "USE TEMP B-TREE"
+
+
+@dataclass
+class Check:
+    name: str                                   # rota / uso da consulta
+    run: Callable[[Session, Dict[str, int]], None]
+    # Tabelas (ou apelidos) em que o SCAN é esperado (ex.: exportar tudo)
+    allow_scan: FrozenSet[str] = frozenset()
+    # Nomes das rotas (name= do roteador) cujas consultas este Check cobre
+    routes: Tuple[str, ...] = ()
+
+
+@dataclass
+class Finding:
+    check: str
+    statement: str
+    plan: List[str]
+    full_scans: List[str] = field(default_factory=list)
+    temp_sort: bool = False
+
+
+# --- Consultas das rotas ---
+# Montadas pelas mesmas funções que as rotas chamam (app/routers/*): mudar
+# a consulta de uma rota muda a consulta conferida aqui.
+
+def _period() -> ExportFilters:
+    today = date.today()
+    return ExportFilters((today - timedelta(days=30)).isoformat(), today.isoformat())
+
+
+def _today() -> ExportFilters:
+    return ExportFilters(date.today().isoformat(), date.today().isoformat())
+
+
+def _list_clients(db, ids):
+    page = clients.clients_page(db)
+    clients.vehicle_counts(db, [client.id for client in page.items] or [ids["client"]])
+
+
+def _show_vehicle(db, ids):
+    vehicles.load_vehicle_detail(db, ids["vehicle"])
+    page = vehicles.vehicle_services_page(db, ids["vehicle"], limit=10)
+    if page.next_cursor:
+        vehicles.vehicle_services_page(db, ids["vehicle"], after=page.next_cursor, limit=10)
+
+
+def _list_services(db, ids):
+    # Fila padrão (em aberto) e um status com período
+    services.services_queue_page(db, ExportFilters(), open_only=True)
+    today = date.today()
+    filters = ExportFilters((today - timedelta(days=30)).isoformat(), today.isoformat(), OPEN_STATUSES[0])
+    services.services_queue_page(db, filters, open_only=False)
+
+
+def _reports_dashboard(db, ids):
+    conn = db.connection()
+    period_from, period_to = reports.dashboard_period(ExportFilters())
+    revenue_rollup.services_by_status(conn, period_from, period_to)
+    revenue_rollup.revenue_by_month(conn, period_from, period_to)
+    revenue_rollup.revenue_by_day(conn, period_to - timedelta(days=30), period_to)
+    revenue_rollup.top_clients(conn, period_from, period_to)
+
+
+def _release_photo(db, ids):
+    db.execute(select(Vehicle.id).where(Vehicle.image_url == "/uploads/blobs/x.jpg").limit(1)).first()
+
+
+def _summary_trigger_lookups(db, ids):
+    # Subconsultas dos triggers de app/service_stats.py (o EXPLAIN de um
+    # INSERT/DELETE não mostra o plano de dentro do trigger)
+    params = {"id": ids["client"]}
+    db.execute(text(
+        "SELECT max(vs.last_service_date) FROM vehicle_service_stats vs "
+        "JOIN vehicles v ON v.id = vs.vehicle_id WHERE v.client_id = :id"), params).all()
+    db.execute(text(
+        "SELECT max(start_date) FROM services WHERE vehicle_id = :id"), {"id": ids["vehicle"]}).all()
+
+
+def _delete_vehicle(db, ids):
+    vehicle = db.query(Vehicle).filter(Vehicle.id == ids["vehicle"]).first()
+    if vehicle is not None:
+        db.delete(vehicle)
+        db.flush()
+
+
+def _delete_client(db, ids):
+    client = db.query(Client).filter(Client.id == ids["client"]).first()
+    if client is not None:
+        [v.image_url for v in client.vehicles]
+        db.delete(client)
+        db.flush()
+
+
+CHECKS: List[Check] = [
+    Check("login", lambda db, ids: db.execute(auth.user_statement("admin")).first(),
+          routes=("login_process",)),
+    Check("list_clients", _list_clients, routes=("list_clients",)),
+    Check("show_client", lambda db, ids: clients.load_client_detail(db, ids["client"]),
+          routes=("show_client",)),
+    # A exportação percorre todos os clientes de propósito
+    Check("export_clients (com filtros)",
+          lambda db, ids: db.execute(clients.export_clients_statement(_period())).all(),
+          frozenset({"clients"}), routes=("export_clients",)),
+    Check("list_vehicles", lambda db, ids: vehicles.vehicles_page(db), routes=("list_vehicles",)),
+    Check("show_vehicle", _show_vehicle, routes=("show_vehicle",)),
+    Check("export_vehicles (com filtros)",
+          lambda db, ids: db.execute(vehicles.export_vehicles_statement(_period())).all(),
+          frozenset({"vehicles"}), routes=("export_vehicles",)),
+    Check("vehicle form (lista de clientes)",
+          lambda db, ids: db.execute(vehicles.client_choices_statement()).all(),
+          routes=("new_vehicle_general", "edit_vehicle_form")),
+    Check("placa duplicada", lambda db, ids: db.execute(vehicles.plate_owner_statement("ABC1D23")).first(),
+          routes=("create_vehicle", "update_vehicle")),
+    Check("list_services (fila)", _list_services, routes=("list_services",)),
+    Check("export_services (com filtros)",
+          lambda db, ids: db.execute(services.export_services_statement(_period())).all(),
+          routes=("export_services",)),
+    Check("reports", _reports_dashboard, routes=("reports",)),
+    Check("report_day", lambda db, ids: db.execute(reports.day_services_statement(_today())).all(),
+          routes=("report_day",)),
+    Check("search", lambda db, ids: search(db, "gol"), routes=("search",)),
+    Check("upload_store.release", _release_photo),
+    Check("triggers de resumo", _summary_trigger_lookups),
+    Check("delete_vehicle (cascata)", _delete_vehicle, routes=("delete_vehicle",)),
+    Check("delete_client (cascata)", _delete_client, routes=("delete_client",)),
+]
+
+# Rotas sem consulta a conferir: telas sem banco, leituras e gravações só
+# pela chave primária (formulários, update/delete de um registro) e as
+# importações (app/import_jobs.py). Uma rota nova precisa entrar num Check
+# ou aqui: senão o consultor termina com código 1.
+UNCHECKED_ROUTES = frozenset({
+    "login_form", "logout", "redirect_to_list", "status", "metrics",
+    "new_client_form", "create_client", "edit_client_form", "update_client",
+    "new_vehicle_form",
+    "new_service_form", "create_service", "edit_service_form", "update_service", "delete_service",
+    "import_vehicles", "list_imports", "show_import", "cancel_import",
+})
+
+
+def uncovered_routes(app) -> List[str]:
+    """Rotas do app que não estão em nenhum Check nem em UNCHECKED_ROUTES."""
+    covered = {route for check in CHECKS for route in check.routes} | UNCHECKED_ROUTES
+    return [route.name for route in app.routes
+            if isinstance(route, APIRoute) and route.name not in covered]
+
+
+def unknown_routes(app) -> List[str]:
+    """Nomes em CHECKS/UNCHECKED_ROUTES que não existem mais no app."""
+    names = {route.name for route in app.routes if isinstance(route, APIRoute)}
+    listed = {route for check in CHECKS for route in check.routes} | UNCHECKED_ROUTES
+    return sorted(listed - names)
+
+
+# --- Execução ---
+
+def _sample_ids(db) -> Dict[str, int]:
+    """Ids reais (cliente/veículo com serviços, se houver) para as consultas."""
+    vehicle = db.execute(select(Service.vehicle_id).limit(1)).scalar() \
+        or db.execute(select(Vehicle.id).limit(1)).scalar() or 1
+    client = db.execute(select(Vehicle.client_id).where(Vehicle.id == vehicle)).scalar() \
+        or db.execute(select(Client.id).limit(1)).scalar() or 1
+    return {"client": client, "vehicle": vehicle}
+
+
+def _capture(db, run: Callable[[], None]) -> List[Tuple[str, tuple]]:
+    """SQL + parâmetros exatamente como enviados ao SQLite durante run()."""
+    statements: List[Tuple[str, tuple]] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, tuple(parameters or ())))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    return statements
+
+
+def explain(db, statement: str, parameters: tuple) -> List[str]:
+    rows = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    return [row[3] for row in rows]
+
+
+def advise(engine, checks: Optional[List[Check]] = None) -> List[Finding]:
+    """Roda as consultas e devolve o plano de cada SQL distinto."""
+    findings: List[Finding] = []
+    seen = set()
+    db = Session(bind=engine)
+    try:
+        ids = _sample_ids(db)
+        for check in checks or CHECKS:
+            captured = _capture(db, lambda: check.run(db, ids))
+            for statement, parameters in captured:
+                if (check.name, statement) in seen:
+                    continue
+                seen.add((check.name, statement))
+                plan = explain(db, statement, parameters)
+                scans = [m.group(1) for m in map(_FULL_SCAN.match, plan) if m]
+                findings.append(Finding(
+                    check=check.name,
+                    statement=" ".join(statement.split()),
+                    plan=plan,
+                    full_scans=[t for t in scans if t not in check.allow_scan],
+                    temp_sort=any(step.startswith(_TEMP_SORT) for step in plan),
+                ))
+    finally:
+        # As exclusões em cascata só servem para ver o plano
+        db.rollback()
+        db.close()
+    return findings
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.index_advisor [--verbose]
+    parser = argparse.ArgumentParser(description="Procura leituras de tabela inteira nas consultas das rotas.")
+    parser.add_argument("--verbose", action="store_true", help="mostra o plano de todas as consultas")
+    args = parser.parse_args()
+
+    from app.database import engine
+    from app.schema import ensure_schema
+    ensure_schema(engine)
+
+    from main import app
+    missing, stale = uncovered_routes(app), unknown_routes(app)
+    for name in missing:
+        print(f"Rota sem consulta conferida: {name} (acrescente em CHECKS ou em UNCHECKED_ROUTES)")
+    for name in stale:
+        print(f"Rota inexistente listada no consultor: {name}")
+
+    findings = advise(engine)
+    problems = [f for f in findings if f.full_scans]
+    for finding in findings:
+        if not (finding.full_scans or args.verbose):
+            continue
+        label = "SCAN " + ", ".join(finding.full_scans) if finding.full_scans else "ok"
+        print(f"[{label}] {finding.check}: {finding.statement[:200]}")
+        for step in finding.plan:
+            print(f"      {step}")
+    sorts = sum(1 for f in findings if f.temp_sort)
+    print(f"{len(findings)} consulta(s) analisada(s), {len(problems)} com leitura da tabela inteira, "
+          f"{sorts} com ordenação em tabela temporária.")
+    sys.exit(1 if problems or missing or stale else 0)
@@ -0,0 +1,267 @@
+import hmac
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from jinja2 import Template
+
+# ----------------------------------------------------
+# MÉTRICAS POR ROTA (formato de texto do Prometheus)
+# MetricsMiddleware é um middleware ASGI puro (sem BaseHTTPMiddleware,
+# que copia a resposta e cria tarefas extras). Por requisição ele guarda:
+# - contagem por rota e status; requisições em andamento;
+# - histograma de latência, de tamanho da resposta, do tempo gasto no
+#   banco, de comandos SQL e do tempo renderizando templates.
+# A rota é o modelo do caminho ('/vehicles/{vehicle_id}'), não a URL:
+# o número de séries fica limitado ao número de rotas.
+# O banco vem do QueryStats da requisição (app/query_stats.py, em
+# scope["query_stats"]); o tempo de template, de TimedTemplate, soma num
+# RequestMetrics guardado num ContextVar, que o threadpool das rotas
+# síncronas herda.
+# Tudo é registrado e lido no event loop (o /metrics é 'async def'):
+# não precisa de lock. O /status (threadpool) só lê contadores simples.
+# O /metrics mostra rotas, volumes e pools: exige login (sessão) ou, para
+# o coletor do Prometheus, "Authorization: Bearer <OFICINA_METRICS_TOKEN>".
+# ----------------------------------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (512, 2048, 8192, 32768, 131072, 524288, 2097152)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "oficina_"
+UNMATCHED_ROUTE = "(sem rota)"
+METRICS_TOKEN = os.environ.get("OFICINA_METRICS_TOKEN", "")   # vazio = só com login
+
+_STARTED_AT = time.monotonic()
+_STARTED_AT_WALL = datetime.now()
+
+
+class Histogram:
+    """Histograma cumulativo no estilo Prometheus (buckets 'le')."""
+
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # o último é o +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "size", "db", "statements", "render")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.db = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.render = Histogram(LATENCY_BUCKETS)
+
+
+class RequestMetrics:
+    """Tempo de template acumulado numa requisição."""
+
+    __slots__ = ("render_seconds",)
+
+    def __init__(self):
+        self.render_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+_routes: Dict[Tuple[str, str], RouteMetrics] = {}
+_responses: Dict[Tuple[str, str, int], int] = {}
+_in_flight = 0
+_requests_total = 0
+
+
+def uptime_seconds() -> float:
+    return time.monotonic() - _STARTED_AT
+
+
+# --- Middleware ---
+
+def metrics_authorized(request) -> bool:
+    """Usuário logado ou coletor com o token de OFICINA_METRICS_TOKEN."""
+    if request.session.get("user"):
+        return True
+    if not METRICS_TOKEN:
+        return False
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), METRICS_TOKEN)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Mount (/static, /uploads): o prefixo montado, sem o arquivo
+        mounted = scope.get("root_path", "")[len(scope.get("app_root_path", "")):]
+        return f"{mounted}/{{path}}"
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _in_flight, _requests_total
+        request = RequestMetrics()
+        token = _current.set(request)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        _in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _in_flight -= 1
+            _requests_total += 1
+            _current.reset(token)
+            key = (scope["method"], _route_label(scope))
+            metrics = _routes.get(key)
+            if metrics is None:
+                metrics = _routes[key] = RouteMetrics()
+            metrics.latency.observe(elapsed)
+            metrics.size.observe(size)
+            queries = scope.get("query_stats")
+            if queries is not None:
+                metrics.db.observe(queries.seconds)
+                metrics.statements.observe(queries.statements)
+            metrics.render.observe(request.render_seconds)
+            response_key = key + (status,)
+            _responses[response_key] = _responses.get(response_key, 0) + 1
+
+
+# --- Templates ---
+
+class TimedTemplate(Template):
+    """Template que soma o tempo do render() na requisição atual."""
+
+    def render(self, *args, **kwargs):
+        request = _current.get()
+        if request is None:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            request.render_seconds += time.perf_counter() - started
+
+
+# --- Estado do pool / exposição ---
+
+def pool_stats(engine) -> Dict[str, int]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        # O SQLAlchemy conta negativo enquanto sobra vaga no pool
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+def _labels(**labels) -> str:
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(lines: List[str], name: str, histograms, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in histograms:
+        cumulative = 0
+        for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {cumulative}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"{name}_sum{labels} {_format_value(histogram.total)}")
+        lines.append(f"{name}_count{labels} {histogram.count}")
+
+
+def render_prometheus(pools: Optional[Dict[str, object]] = None) -> str:
+    """Todas as métricas no formato de texto 0.0.4 do Prometheus."""
+    p = METRIC_PREFIX
+    lines: List[str] = [
+        f"# HELP {p}http_requests_total Requisições respondidas, por rota e status.",
+        f"# TYPE {p}http_requests_total counter",
+    ]
+    for (method, route, status), count in sorted(_responses.items()):
+        lines.append(f"{p}http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines += [
+        f"# HELP {p}http_requests_in_flight Requisições em andamento.",
+        f"# TYPE {p}http_requests_in_flight gauge",
+        f"{p}http_requests_in_flight {_in_flight}",
+    ]
+
+    routes = sorted(_routes.items())
+    _histogram_lines(lines, f"{p}http_request_duration_seconds",
+                     [(key, m.latency) for key, m in routes], "Latência da requisição.")
+    _histogram_lines(lines, f"{p}http_response_size_bytes",
+                     [(key, m.size) for key, m in routes], "Tamanho do corpo da resposta.")
+    _histogram_lines(lines, f"{p}http_db_seconds",
+                     [(key, m.db) for key, m in routes], "Tempo em comandos SQL por requisição.")
+    _histogram_lines(lines, f"{p}http_db_statements",
+                     [(key, m.statements) for key, m in routes], "Comandos SQL por requisição.")
+    _histogram_lines(lines, f"{p}http_template_render_seconds",
+                     [(key, m.render) for key, m in routes], "Tempo renderizando templates por requisição.")
+
+    if pools:
+        for field in ("size", "checked_out", "checked_in", "overflow"):
+            name = f"{p}db_pool_{field}"
+            lines.append(f"# HELP {name} Conexões do pool ({field}).")
+            lines.append(f"# TYPE {name} gauge")
+            for pool_name, engine in pools.items():
+                lines.append(f"{name}{_labels(pool=pool_name)} {pool_stats(engine)[field]}")
+
+    lines += [
+        f"# HELP {p}process_uptime_seconds Tempo desde o início do processo.",
+        f"# TYPE {p}process_uptime_seconds gauge",
+        f"{p}process_uptime_seconds {_format_value(uptime_seconds())}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def status_info(pools: Dict[str, object]) -> dict:
+    """Resumo para o /status: tempo no ar, requisições e pools."""
+    return {
+        "started_at": _STARTED_AT_WALL.isoformat(timespec="seconds"),
+        "uptime_seconds": round(uptime_seconds(), 1),
+        "requests_total": _requests_total,
+        "requests_in_flight": _in_flight,
+        "pools": {name: pool_stats(engine) for name, engine in pools.items()},
+    }
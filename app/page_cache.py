@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+from starlette.requests import Request
+from starlette.responses import Response
+
+# ----------------------------------------------------
+# CACHE DE PÁGINAS COM VERSÃO POR ENTIDADE
+# Cada tabela (clients, vehicles, services) tem um número de versão na
+# tabela cache_versions, incrementado por triggers do SQLite na mesma
+# transação que altera linhas dela (ORM, INSERT em lote da importação ou
+# SQL direto). Por estar no banco, a versão é a mesma em todos os
+# processos (uvicorn --workers N): uma gravação em um worker invalida as
+# páginas guardadas em todos. 'photos' (miniaturas novas) é incrementada
+# por bump(). As páginas declaram de quais tabelas dependem; o ETag e a
+# chave do cache incluem essas versões. Enquanto nada muda:
+# - o navegador que já tem a página recebe 304 (If-None-Match);
+# - outro acesso à mesma página usa o HTML já renderizado (LRU),
+#   consultando só as versões (um SELECT em cache_versions, 4 linhas).
+# O HTML guardado é de cada processo; o ETag leva _BOOT_ID, então o ETag
+# de um worker não vale em outro (a página é refeita, nunca fica velha).
+# ----------------------------------------------------
+PAGE_CACHE_SIZE = 256                 # páginas renderizadas guardadas
+CACHE_CONTROL = "private, no-cache"   # o navegador guarda, mas sempre revalida
+
+CACHE_TABLES = ("clients", "vehicles", "services")
+CACHE_ENTITIES = CACHE_TABLES + ("photos",)
+
+# Muda a cada processo: um ETag de antes de reiniciar (outro código,
+# outros templates com as mesmas versões) nunca vale
+_BOOT_ID = os.urandom(4).hex()
+
+_pages: "OrderedDict[Tuple, bytes]" = OrderedDict()
+_pages_lock = threading.Lock()
+
+
+# --- Versões (tabela cache_versions) ---
+
+def _triggers():
+    for table in CACHE_TABLES:
+        for event, suffix in (("INSERT", "ai"), ("UPDATE", "au"), ("DELETE", "ad")):
+            yield (
+                f"CREATE TRIGGER IF NOT EXISTS {table}_cache_version_{suffix} AFTER {event} ON {table} "
+                f"BEGIN UPDATE cache_versions SET version = version + 1 WHERE entity = '{table}'; END"
+            )
+
+
+def setup_cache_versions(engine) -> None:
+    """Cria as linhas de cache_versions e os triggers (idempotente)."""
+    with engine.begin() as conn:
+        for entity in CACHE_ENTITIES:
+            conn.execute(text("INSERT OR IGNORE INTO cache_versions(entity, version) VALUES (:entity, 0)"),
+                         {"entity": entity})
+        for ddl in _triggers():
+            conn.execute(text(ddl))
+
+
+def bump(*entities: str) -> None:
+    """Marca as entidades como alteradas fora das tabelas (ex.: 'photos')."""
+    from app.db_writer import db_writer
+
+    def _bump(session):
+        for entity in entities:
+            session.execute(text("UPDATE cache_versions SET version = version + 1 WHERE entity = :entity"),
+                            {"entity": entity})
+    db_writer.run(_bump)
+
+
+def versions(entities: Iterable[str]) -> Tuple[int, ...]:
+    from app.database import engine
+
+    with engine.connect() as conn:
+        current: Dict[str, int] = dict(conn.execute(text("SELECT entity, version FROM cache_versions")).all())
+    return tuple(current.get(entity, 0) for entity in entities)
+
+
+def clear() -> None:
+    with _pages_lock:
+        _pages.clear()
+
+
+# --- Resposta com ETag / cache ---
+
+def cached_page(
+    request: Request,
+    username: Optional[str],
+    depends_on: Iterable[str],
+    render: Callable[[], Response],
+    vary: Iterable = (),
+) -> Response:
+    """
+    Devolve 304, o HTML guardado ou o resultado de `render()` (que faz as
+    consultas e o TemplateResponse). `depends_on` lista as tabelas
+    mostradas na página; `vary`, o que a página usa além da URL (ex.: o
+    período padrão calculado a partir de hoje).
+    """
+    depends_on = tuple(depends_on)
+    key = (request.url.path, request.url.query, username, depends_on, versions(depends_on), tuple(vary))
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+    etag = f'W/"{_BOOT_ID}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    with _pages_lock:
+        body = _pages.get(key)
+        if body is not None:
+            _pages.move_to_end(key)
+    if body is not None:
+        return Response(body, media_type="text/html", headers=headers)
+
+    response = render()
+    if response.status_code != 200:
+        return response
+    with _pages_lock:
+        _pages[key] = response.body
+        while len(_pages) > PAGE_CACHE_SIZE:
+            _pages.popitem(last=False)
+    response.headers.update(headers)
+    return response
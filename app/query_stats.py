@@ -0,0 +1,189 @@
+import os
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+
+# ----------------------------------------------------
+# SQL POR REQUISIÇÃO: CONTAGEM, SQL LENTO E SUSPEITA DE N+1
+# instrument(engine) liga os eventos de cursor (app/database.py faz isso
+# nas engines). Todo comando é cronometrado:
+# - acima de SLOW_QUERY_SECONDS vai para o log com o EXPLAIN QUERY PLAN
+#   (dentro ou fora de requisição: importações, CLIs), no máximo uma vez
+#   por forma a cada SLOW_LOG_INTERVAL segundos (cargas em massa repetem
+#   o mesmo comando milhares de vezes). Os parâmetros têm dados dos
+#   clientes e hashes de senha: só saem no log com OFICINA_DEBUG=1;
+# - dentro de uma requisição (QueryStatsMiddleware), soma no QueryStats
+#   dela: número de comandos, tempo total e quantas vezes cada "forma" de
+#   SELECT apareceu. A mesma forma N_PLUS_ONE_REPEATS vezes ou mais numa
+#   requisição é carga preguiçosa dentro de um laço (N+1): sai no log uma
+#   vez por rota e forma.
+# Com OFICINA_DEBUG=1 a resposta também leva o resumo nos cabeçalhos
+# X-Query-Stats e Server-Timing (aparece no DevTools do navegador).
+# As gravações de app/db_writer.py rodam na thread do escritor, fora da
+# requisição: entram no log de SQL lento, não na contagem da página.
+# ----------------------------------------------------
+SLOW_QUERY_SECONDS = int(os.environ.get("OFICINA_SLOW_QUERY_MS", "100")) / 1000
+N_PLUS_ONE_REPEATS = 5
+SLOW_LOG_INTERVAL = 60        # segundos entre dois logs da mesma forma de SQL lento
+DEBUG = os.environ.get("OFICINA_DEBUG") == "1"
+MAX_LOGGED_PARAMS = 300       # caracteres dos parâmetros no log (só com DEBUG)
+
+_EXPLAINABLE = ("SELECT", "WITH", "UPDATE", "DELETE")
+# "IN (?, ?, ?)" e "VALUES (?, ?), (?, ?)" têm a mesma forma com 1 ou 100 itens
+_PARAM_LIST = re.compile(r"\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))*")
+_STARTED_KEY = "query_stats_started"
+
+
+class QueryStats:
+    """Comandos SQL de uma requisição."""
+
+    __slots__ = ("statements", "seconds", "shapes")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.shapes: Dict[str, int] = {}
+
+    def n_plus_one(self) -> List[Tuple[str, int]]:
+        """Formas de SELECT repetidas o bastante para serem N+1 (mais repetida primeiro)."""
+        repeated = [(shape, n) for shape, n in self.shapes.items() if n >= N_PLUS_ONE_REPEATS]
+        return sorted(repeated, key=lambda item: -item[1])
+
+    def summary(self) -> str:
+        text = f"{self.statements} SQL; {self.seconds * 1000:.1f} ms"
+        suspects = self.n_plus_one()
+        if suspects:
+            text += f"; N+1: {len(suspects)} ({suspects[0][1]}x)"
+        return text
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_reported: Set[Tuple[str, str]] = set()
+_slow_logged: Dict[str, Tuple[float, int]] = {}   # forma -> (último log, omitidos desde então)
+
+
+def current() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAM_LIST.sub("(?)", " ".join(statement.split()))
+
+
+# --- Eventos da engine ---
+
+def _explain(conn, statement: str, parameters) -> List[str]:
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _log_slow(conn, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+    shape = statement_shape(statement)
+    now = time.monotonic()
+    last, skipped = _slow_logged.get(shape, (None, 0))
+    if last is not None and now - last < SLOW_LOG_INTERVAL:
+        _slow_logged[shape] = (last, skipped + 1)
+        return
+    _slow_logged[shape] = (now, 0)
+
+    repeated = f" (+{skipped} vez(es) omitidas)" if skipped else ""
+    print(f"SQL lento ({elapsed * 1000:.0f} ms){repeated}: {shape}")
+    if executemany:
+        print(f"  parâmetros: {len(parameters)} linha(s) (executemany)")
+        return
+    if DEBUG:
+        print(f"  parâmetros: {repr(parameters)[:MAX_LOGGED_PARAMS]}")
+    if statement.lstrip().upper().startswith(_EXPLAINABLE):
+        try:
+            for step in _explain(conn, statement, parameters):
+                print(f"  plano: {step}")
+        except Exception as e:
+            print(f"Erro no EXPLAIN do SQL lento: {e}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info[_STARTED_KEY].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+        if statement.lstrip()[:6].upper() == "SELECT":
+            shape = statement_shape(statement)
+            stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+    if elapsed >= SLOW_QUERY_SECONDS:
+        _log_slow(conn, statement, parameters, executemany, elapsed)
+
+
+def _handle_error(exception_context):
+    # Comando que falhou não passa pelo after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get(_STARTED_KEY):
+        conn.info[_STARTED_KEY].pop()
+
+
+def instrument(engine) -> None:
+    """Cronometra os comandos da engine (SQL lento e QueryStats da requisição)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# --- Middleware ---
+
+def _report_n_plus_one(scope, stats: QueryStats) -> None:
+    route = scope.get("route")
+    label = f"{scope['method']} {route.path if route is not None else scope['path']}"
+    for shape, count in stats.n_plus_one():
+        if (label, shape) in _reported:
+            continue
+        _reported.add((label, shape))
+        print(f"Possível N+1 em {label}: {count}x {shape[:200]}")
+
+
+class QueryStatsMiddleware:
+    """
+    Abre um QueryStats por requisição. Ele fica em scope["query_stats"]
+    para os middlewares de fora (app/metrics.py usa o tempo de banco).
+    """
+
+    def __init__(self, app, debug_headers: bool = DEBUG):
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        scope["query_stats"] = stats
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            # O corpo já foi renderizado quando o início da resposta sai
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-query-stats", stats.summary().encode("latin-1")))
+                headers.append((b"server-timing",
+                                f'db;dur={stats.seconds * 1000:.1f};desc="{stats.statements} SQL"'
+                                .encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if self.debug_headers else send)
+        finally:
+            _current.reset(token)
+            if stats.statements >= N_PLUS_ONE_REPEATS:
+                _report_n_plus_one(scope, stats)
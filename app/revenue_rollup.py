@@ -0,0 +1,166 @@
+import argparse
+import calendar
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.models.service import ServiceStatus
+
+# ----------------------------------------------------
+# FATURAMENTO POR DIA (BASE DOS RELATÓRIOS)
+# revenue_daily guarda, para cada dia e status, quantos serviços e quanto
+# faturaram. Triggers em 'services' aplicam só a diferença de cada
+# INSERT/UPDATE/DELETE (como em app/service_stats.py), então o painel
+# /reports lê algumas centenas de linhas por ano em vez de todos os
+# serviços. Mês, status e ticket médio saem da soma dessas linhas.
+# Os maiores clientes do período não cabem no resumo por dia: saem dos
+# serviços do período (índice ix_services_start_date).
+# ----------------------------------------------------
+DONE_STATUS = ServiceStatus.CONCLUIDO.value   # "faturado" = serviço concluído
+TOP_CLIENTS_LIMIT = 10
+
+# Dia do serviço `t` (new/old); start_date pode vir com hora
+_DAY_OF = "substr({t}.start_date, 1, 10)"
+
+
+def _add_service(t: str) -> str:
+    day = _DAY_OF.format(t=t)
+    return f"""
+        INSERT OR IGNORE INTO revenue_daily(day, status) SELECT {day}, {t}.status
+            WHERE {t}.start_date IS NOT NULL;
+        UPDATE revenue_daily SET
+            service_count = service_count + 1,
+            revenue = revenue + coalesce({t}.price, 0)
+        WHERE day = {day} AND status = {t}.status;
+    """
+
+
+def _remove_service(t: str) -> str:
+    day = _DAY_OF.format(t=t)
+    return f"""
+        UPDATE revenue_daily SET
+            service_count = service_count - 1,
+            revenue = revenue - coalesce({t}.price, 0)
+        WHERE day = {day} AND status = {t}.status;
+        DELETE FROM revenue_daily
+        WHERE day = {day} AND status = {t}.status AND service_count <= 0;
+    """
+
+
+def _triggers() -> List[str]:
+    return [
+        "CREATE TRIGGER IF NOT EXISTS services_revenue_ai AFTER INSERT ON services "
+        f"BEGIN {_add_service('new')} END",
+        "CREATE TRIGGER IF NOT EXISTS services_revenue_ad AFTER DELETE ON services "
+        f"BEGIN {_remove_service('old')} END",
+        "CREATE TRIGGER IF NOT EXISTS services_revenue_au "
+        "AFTER UPDATE OF status, price, start_date ON services "
+        f"BEGIN {_remove_service('old')} {_add_service('new')} END",
+    ]
+
+
+def rebuild_revenue_rollup(conn) -> None:
+    """Recalcula revenue_daily a partir da tabela 'services'."""
+    conn.execute(text("DELETE FROM revenue_daily"))
+    conn.execute(text(
+        "INSERT INTO revenue_daily(day, status, service_count, revenue) "
+        "SELECT substr(start_date, 1, 10), status, count(*), coalesce(sum(coalesce(price, 0)), 0) "
+        "FROM services WHERE start_date IS NOT NULL "
+        "GROUP BY substr(start_date, 1, 10), status"
+    ))
+
+
+def setup_revenue_rollup(engine) -> None:
+    """Cria os triggers (idempotente) e recalcula o faturamento diário."""
+    with engine.begin() as conn:
+        for ddl in _triggers():
+            conn.execute(text(ddl))
+        rebuild_revenue_rollup(conn)
+
+
+# --- Consultas do painel (todas sobre revenue_daily, pela chave 'day') ---
+
+def _period(date_from: date, date_to: date) -> Dict[str, str]:
+    return {"date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
+
+
+def revenue_by_day(conn, date_from: date, date_to: date) -> List[dict]:
+    rows = conn.execute(text(
+        "SELECT day, sum(service_count) AS services, "
+        "sum(CASE WHEN status = :done THEN revenue ELSE 0 END) AS revenue "
+        "FROM revenue_daily WHERE day BETWEEN :date_from AND :date_to "
+        "GROUP BY day ORDER BY day DESC"
+    ), {"done": DONE_STATUS, **_period(date_from, date_to)})
+    return [dict(row._mapping) for row in rows]
+
+
+def revenue_by_month(conn, date_from: date, date_to: date) -> List[dict]:
+    rows = conn.execute(text(
+        "SELECT substr(day, 1, 7) AS month, sum(service_count) AS services, "
+        "sum(CASE WHEN status = :done THEN revenue ELSE 0 END) AS revenue "
+        "FROM revenue_daily WHERE day BETWEEN :date_from AND :date_to "
+        "GROUP BY substr(day, 1, 7) ORDER BY month DESC"
+    ), {"done": DONE_STATUS, **_period(date_from, date_to)})
+    months = []
+    for row in rows:
+        month = dict(row._mapping)
+        year, number = (int(part) for part in month["month"].split("-"))
+        # Período do mês, para o link de detalhe por dia
+        month["first_day"] = date(year, number, 1)
+        month["last_day"] = date(year, number, calendar.monthrange(year, number)[1])
+        months.append(month)
+    return months
+
+
+def services_by_status(conn, date_from: date, date_to: date) -> List[dict]:
+    """Quantidade e valor por status (todos os status, mesmo os sem serviço)."""
+    rows = conn.execute(text(
+        "SELECT status, sum(service_count) AS services, sum(revenue) AS revenue "
+        "FROM revenue_daily WHERE day BETWEEN :date_from AND :date_to GROUP BY status"
+    ), _period(date_from, date_to))
+    found = {row.status: row for row in rows}
+    result = []
+    for status in ServiceStatus:
+        row = found.get(status.value)
+        result.append({
+            "status": status.value,
+            "services": row.services if row else 0,
+            "revenue": row.revenue if row else 0.0,
+        })
+    return result
+
+
+def average_ticket(by_status: List[dict]) -> Optional[float]:
+    """Faturamento médio por serviço concluído."""
+    for row in by_status:
+        if row["status"] == DONE_STATUS and row["services"]:
+            return row["revenue"] / row["services"]
+    return None
+
+
+def top_clients(conn, date_from: date, date_to: date, limit: int = TOP_CLIENTS_LIMIT) -> List[dict]:
+    """Clientes com maior total cobrado no período (mesma soma de client_service_stats)."""
+    rows = conn.execute(text(
+        "SELECT c.id, c.name, count(*) AS service_count, "
+        "sum(coalesce(s.price, 0)) AS total_billed "
+        "FROM services s JOIN vehicles v ON v.id = s.vehicle_id "
+        "JOIN clients c ON c.id = v.client_id "
+        "WHERE s.start_date BETWEEN :date_from AND :date_to "
+        "GROUP BY c.id HAVING total_billed > 0 "
+        "ORDER BY total_billed DESC LIMIT :limit"
+    ), {"limit": limit, **_period(date_from, date_to)})
+    return [dict(row._mapping) for row in rows]
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.revenue_rollup rebuild
+    parser = argparse.ArgumentParser(description="Faturamento diário (relatórios).")
+    parser.add_argument("command", choices=("rebuild",))
+    parser.parse_args()
+
+    from app.database import engine
+    setup_revenue_rollup(engine)
+    with engine.connect() as conn:
+        days = conn.execute(text("SELECT count(DISTINCT day) FROM revenue_daily")).scalar()
+    print(f"Faturamento recalculado: {days} dia(s) com serviços.")
@@ -1,28 +1,31 @@
-import sys
-from pathlib import Path
 from fastapi import APIRouter, Request, Form, Depends, HTTPException
-from fastapi.templating import Jinja2Templates
 from starlette.responses import RedirectResponse
 from starlette import status
 
 # --- NOVAS IMPORTAÇÕES DO BANCO ---
-from app.database import SessionLocal  # Importa o criador de sessão
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.database import get_async_db  # Sessão do banco por requisição
 from app.database_models import User   # Importa o modelo da tabela Users
 # ----------------------------------
 
-from app.auth_utils import verify_password
+from app.auth_utils import (
+    verify_password_async, login_retry_after, record_login_attempt, PasswordCheckBusy
+)
 # (Não precisamos mais do FAKE_USER_DB, então foi removido)
 
 router = APIRouter(tags=["auth"])
 
-# --- LÓGICA DE TEMPLATES (sem alteração) ---
-if getattr(sys, 'frozen', False):
-    BASE_DIR = Path(sys._MEIPASS) 
-else:
-    BASE_DIR = Path(".") 
-templates = Jinja2Templates(directory=BASE_DIR / "app" / "templates") 
+# --- TEMPLATES (ambiente Jinja2 compartilhado, app/templating.py) ---
+from app.templating import templates
 # -----------------------------------------------------------------
 
+
+def user_statement(username: str):
+    """Usuário pelo nome (também usada por app/index_advisor.py)."""
+    return select(User).where(User.username == username)
+
+
 # --- ROTA 1: MOSTRAR O FORMULÁRIO DE LOGIN (sem alteração) ---
 @router.get("/login", name="login_form")
 def login_form(request: Request):
@@ -36,35 +39,53 @@ def login_form(request: Request):
     )
 
 # --- ROTA 2: PROCESSAR O LOGIN (MODIFICADA) ---
+def _login_error(request: Request, message: str, status_code: int = 200, headers=None):
+    return templates.TemplateResponse(
+        "auth/login.html", 
+        {
+            "request": request, 
+            "title": "Login",
+            "error": message
+        },
+        status_code=status_code,
+        headers=headers
+    )
+
 @router.post("/login", name="login_process")
-def login_process(request: Request, username: str = Form(...), password: str = Form(...)):
+async def login_process(request: Request, username: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     """Processa os dados de login usando o banco de dados SQLAlchemy."""
-    
-    # 1. Cria uma sessão com o banco
-    db = SessionLocal()
-    
-    try:
-        # 2. Busca o usuário no banco de dados (substitui o FAKE_USER_DB)
-        user = db.query(User).filter(User.username == username).first()
+    client_ip = request.client.host if request.client else "desconhecido"
 
-        # 3. Verifica a senha (mesma lógica de antes)
-        if user and verify_password(password, user.password_hash):
-            # Se sim, salva na sessão
-            request.session["user"] = user.username
-            return RedirectResponse(url="/clients", status_code=status.HTTP_303_SEE_OTHER)
-        
-        # 4. Se falhar, recarrega o login com erro
-        return templates.TemplateResponse(
-            "auth/login.html", 
-            {
-                "request": request, 
-                "title": "Login",
-                "error": "Usuário ou senha inválidos."
-            }
+    # 1. Caminho rápido: usuário/IP com tentativas demais é recusado sem calcular hash
+    retry_after = login_retry_after(username, client_ip)
+    if retry_after:
+        minutes = max(1, round(retry_after / 60))
+        return _login_error(
+            request, f"Muitas tentativas. Tente novamente em {minutes} minuto(s).",
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(int(retry_after) + 1)}
         )
-    finally:
-        # 5. Fecha a sessão, não importa o que aconteça
-        db.close()
+
+    # 2. Busca o usuário no banco de dados (sessão async, uma por requisição)
+    user = (await db.execute(user_statement(username))).scalars().first()
+
+    # 3. Verifica a senha no executor do scrypt (fila limitada)
+    try:
+        valid = await verify_password_async(password, user.password_hash if user else None)
+    except PasswordCheckBusy:
+        return _login_error(
+            request, "Servidor ocupado. Tente novamente em instantes.",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "2"}
+        )
+    record_login_attempt(username, client_ip, valid)
+
+    if valid:
+        # Se sim, salva na sessão
+        request.session["user"] = user.username
+        return RedirectResponse(url="/clients", status_code=status.HTTP_303_SEE_OTHER)
+    
+    # 4. Se falhar, recarrega o login com erro
+    return _login_error(request, "Usuário ou senha inválidos.")
 
 # --- ROTA 3: LOGOUT (sem alteração) ---
 @router.get("/logout", name="logout")
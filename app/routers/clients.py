@@ -1,16 +1,21 @@
-import sys
-from pathlib import Path
-from typing import Optional
-from fastapi import APIRouter, Request, Form, HTTPException
-from fastapi.templating import Jinja2Templates
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Request, Form, HTTPException, Query, Depends
 from starlette.responses import RedirectResponse
 from starlette import status
 
 # --- IMPORTAÇÕES DO BANCO DE DADOS (SQLAlchemy) ---
-from app.database import SessionLocal
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.database import get_db
+from app.db_writer import db_writer
 # Importa os MODELOS DAS TABELAS (para query) e não os Pydantic
 from app.database_models import Client, Vehicle, Service
 # --------------------------------------------------
+from app.helpers.pagination import Page, keyset_paginate
+from app.export_utils import ExportFilters, stream_export, fetch_rows
+from app.upload_store import release
+from app.page_cache import cached_page
+from app.service_stats import OPEN_STATUSES
+from sqlalchemy import select, exists, and_, func
 
 # --- IMPORTAÇÃO DA FUNÇÃO DE AUTH ---
 from app.auth_utils import get_current_user
@@ -19,15 +24,69 @@ from app.auth_utils import get_current_user
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
-# --- LÓGICA DE TEMPLATES (sem alteração) ---
-if getattr(sys, 'frozen', False):
-    BASE_DIR = Path(sys._MEIPASS) 
-else:
-    BASE_DIR = Path(".") 
-templates = Jinja2Templates(directory=BASE_DIR / "app" / "templates") 
+# --- TEMPLATES (ambiente Jinja2 compartilhado, app/templating.py) ---
+from app.templating import templates
 # ----------------------------------------------------
 
 
+# --- Consultas das páginas de cliente ---
+# (também usadas por app/index_advisor.py, que confere o plano de cada uma)
+# Número fixo de consultas, qualquer que seja a frota do cliente:
+# - lista: a página de clientes (+ resumo, joinedload) e uma contagem
+#   agrupada dos veículos só dos clientes da página;
+# - detalhe: o cliente (+ resumo), os veículos (selectinload, + resumo de
+#   cada um) e os serviços em aberto de todos eles (selectinload com filtro).
+
+def clients_page(db: Session, after: Optional[str] = None, before: Optional[str] = None,
+                 limit: Optional[int] = None) -> Page:
+    """
+    Paginação por cursor sobre (name, id): usa o índice de 'name' e não
+    depende de OFFSET, então o custo é o mesmo em qualquer página.
+    """
+    return keyset_paginate(
+        db.query(Client).options(joinedload(Client.stats)), [Client.name, Client.id],
+        after=after, before=before, limit=limit
+    )
+
+
+def vehicle_counts(db: Session, client_ids: List[int]) -> Dict[int, int]:
+    """Quantos veículos cada cliente tem (um GROUP BY pelo índice de client_id)."""
+    if not client_ids:
+        return {}
+    rows = db.execute(
+        select(Vehicle.client_id, func.count(Vehicle.id))
+        .where(Vehicle.client_id.in_(client_ids))
+        .group_by(Vehicle.client_id)
+    )
+    return dict(rows.all())
+
+
+def load_client_detail(db: Session, client_id: int) -> Optional[Client]:
+    """
+    Cliente com todos os veículos e, em cada veículo, só os serviços em
+    aberto. 'vehicle.services' fica com essa parte da coleção: a sessão é
+    da requisição e não grava nada, então serve só para exibir.
+    """
+    return db.query(Client).options(
+        joinedload(Client.stats),
+        selectinload(Client.vehicles).options(
+            joinedload(Vehicle.stats),
+            selectinload(Vehicle.services.and_(Service.status.in_(OPEN_STATUSES))),
+        ),
+    ).filter(Client.id == client_id).first()
+
+
+def export_clients_statement(filters: ExportFilters):
+    """Com filtros, só os clientes que têm serviços no período/status."""
+    statement = select(Client.id, Client.name, Client.phone, Client.email).order_by(Client.id)
+    if filters.active:
+        statement = statement.where(exists().where(and_(
+            Vehicle.client_id == Client.id,
+            filters.has_matching_service(Vehicle.id)
+        )))
+    return statement
+
+
 # Rota 1: Exibir Formulário de Novo Cliente (PROTEGIDA)
 # (Esta rota não muda, pois só renderiza o template)
 @router.get("/new", name="new_client_form")
@@ -48,19 +107,16 @@ def create_client(
 ):
     get_current_user(request)
     
-    # Cria o novo objeto Client do SQLAlchemy
-    new_client = Client(name=name, phone=phone, email=email)
+    def _create(session):
+        # Cria o novo objeto Client do SQLAlchemy
+        session.add(Client(name=name, phone=phone, email=email))
     
-    db = SessionLocal()
     try:
-        db.add(new_client) # Adiciona o objeto à sessão
-        db.commit()        # Salva no banco de dados
+        # A gravação vai para a thread escritora (commit em grupo)
+        db_writer.run(_create)
     except Exception as e:
-        db.rollback()
         # Tratar erro (ex: email duplicado)
         print(f"Erro ao criar cliente: {e}")
-    finally:
-        db.close()
 
     return RedirectResponse(
         router.url_path_for("list_clients"),
@@ -69,72 +125,89 @@ def create_client(
 
 # Rota 3: Listar Clientes (MODIFICADA)
 @router.get("/", name="list_clients")
-def list_clients(request: Request):
+def list_clients(
+    request: Request,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        # Substitui "list(FAKE_CLIENT_DB.values())"
-        clients_list = db.query(Client).order_by(Client.name).all()
-    finally:
-        db.close()
-    
-    return templates.TemplateResponse(
-        "clients/list.html",
-        {
-            "request": request, 
-            "clients": clients_list, 
-            "title": "Lista de Clientes",
-            "username": username
-        }
+    def _render():
+        page = clients_page(db, after=after, before=before, limit=limit)
+
+        return templates.TemplateResponse(
+            "clients/list.html",
+            {
+                "request": request, 
+                "clients": page.items, 
+                "vehicle_counts": vehicle_counts(db, [client.id for client in page.items]),
+                "page": page,
+                "title": "Lista de Clientes",
+                "username": username
+            }
+        )
+
+    # Sem alteração nos clientes desde a última visita: 304 ou HTML guardado
+    return cached_page(request, username, ("clients", "vehicles", "services"), _render)
+
+# Rota 3.1: Exportar Clientes (CSV/XLSX em streaming)
+# Com filtros, exporta só clientes que têm serviços no período/status
+@router.get("/export", name="export_clients")
+def export_clients(
+    request: Request,
+    fmt: str = Query("csv", alias="format"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    service_status: Optional[str] = Query(None, alias="status"),
+):
+    get_current_user(request)
+    statement = export_clients_statement(ExportFilters(date_from, date_to, service_status))
+
+    return stream_export(
+        fmt, "clientes",
+        ["ID", "Nome", "Telefone", "Email"],
+        lambda db: fetch_rows(db, statement)
     )
 
 # Rota 4: Exibir Detalhes de um Cliente (MODIFICADA)
 @router.get("/{client_id}", name="show_client")
-def show_client(request: Request, client_id: int):
+def show_client(request: Request, client_id: int, db: Session = Depends(get_db)):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        # Busca o cliente (substitui FAKE_DB.get())
-        # .first() retorna o primeiro resultado ou None
-        client = db.query(Client).filter(Client.id == client_id).first()
-        
+    def _render():
+        # Cliente, veículos e serviços em aberto: três consultas no total
+        client = load_client_detail(db, client_id)
+
         if not client:
             raise HTTPException(status_code=404, detail="Cliente não encontrado")
 
-        # Busca os veículos (a lógica é a mesma, só muda a fonte)
-        # O SQLAlchemy já popula 'client.vehicles' por causa do 'relationship'
-        # que definimos em 'database_models.py'
-        vehicles_list = client.vehicles 
-    
-    finally:
-        db.close()
-    
-    return templates.TemplateResponse(
-        "clients/show.html",
-        {
-            "request": request, 
-            "title": f"Detalhes do Cliente: {client.name}", 
-            "client": client,
-            "vehicles": vehicles_list,
-            "username": username
-        }
-    )
+        vehicles_list = sorted(client.vehicles, key=lambda v: (v.model, v.id))
+
+        return templates.TemplateResponse(
+            "clients/show.html",
+            {
+                "request": request, 
+                "title": f"Detalhes do Cliente: {client.name}", 
+                "client": client,
+                "vehicles": vehicles_list,
+                "username": username
+            }
+        )
+
+    # Página do cliente e dos veículos dele: refeita só quando um dos dois muda
+    return cached_page(request, username, ("clients", "vehicles", "services"), _render)
 
 # Rota 5: Exibir Formulário de Edição (MODIFICADA)
 @router.get("/{client_id}/edit", name="edit_client_form")
-def edit_client_form(request: Request, client_id: int):
+def edit_client_form(request: Request, client_id: int, db: Session = Depends(get_db)):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        client = db.query(Client).filter(Client.id == client_id).first()
-        
-        if not client:
-            raise HTTPException(status_code=404, detail="Cliente não encontrado")
-    finally:
-        db.close()
+    client = db.query(Client).filter(Client.id == client_id).first()
+    
+    if not client:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado")
 
     return templates.TemplateResponse(
         "clients/edit.html",
@@ -153,14 +226,13 @@ def update_client(
     client_id: int,
     name: str = Form(...),
     phone: str = Form(...),
-    email: Optional[str] = Form(None),
+    email: Optional[str] = Form(None)
 ):
     get_current_user(request)
     
-    db = SessionLocal()
-    try:
+    def _update(session):
         # 1. Busca o cliente existente
-        client_to_update = db.query(Client).filter(Client.id == client_id).first()
+        client_to_update = session.query(Client).filter(Client.id == client_id).first()
         
         if not client_to_update:
             raise HTTPException(status_code=404, detail="Cliente não encontrado")
@@ -169,14 +241,12 @@ def update_client(
         client_to_update.name = name
         client_to_update.phone = phone
         client_to_update.email = email
-        
-        # 3. Salva no banco
-        db.commit()
+    
+    try:
+        # 3. Salva no banco (thread escritora)
+        db_writer.run(_update)
     except Exception as e:
-        db.rollback()
         print(f"Erro ao atualizar cliente: {e}")
-    finally:
-        db.close()
 
     return RedirectResponse(
         router.url_path_for("show_client", client_id=client_id),
@@ -192,10 +262,9 @@ def delete_client(
 ):
     get_current_user(request)
     
-    db = SessionLocal()
-    try:
+    def _delete(session):
         # 1. Busca o cliente
-        client_to_delete = db.query(Client).filter(Client.id == client_id).first()
+        client_to_delete = session.query(Client).filter(Client.id == client_id).first()
         
         if not client_to_delete:
             raise HTTPException(status_code=404, detail="Cliente não encontrado")
@@ -204,15 +273,18 @@ def delete_client(
         # Graças ao 'cascade="all, delete-orphan"' que definimos nos modelos,
         # o SQLAlchemy irá deletar automaticamente todos os Veículos e Serviços
         # relacionados a este cliente.
-        db.delete(client_to_delete)
-        
-        # 3. Salva a mudança
-        db.commit()
+        image_urls = [v.image_url for v in client_to_delete.vehicles]
+        session.delete(client_to_delete)
+        return image_urls
+    
+    try:
+        # 3. Salva a mudança (thread escritora)
+        image_urls = db_writer.run(_delete)
     except Exception as e:
-        db.rollback()
         print(f"Erro ao deletar cliente: {e}")
-    finally:
-        db.close()
+    else:
+        # 4. Apaga as fotos que ficaram sem uso (falhas vão para o log)
+        release(image_urls)
     
     return RedirectResponse(
         router.url_path_for("list_clients"),
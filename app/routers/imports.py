@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Request, HTTPException
+
+from app.import_jobs import get_job, list_jobs
+
+# --- IMPORTAÇÃO DA FUNÇÃO DE AUTH ---
+from app.auth_utils import get_current_user
+# ------------------------------------
+
+router = APIRouter(prefix="/imports", tags=["imports"])
+
+
+# Rota 1: Lista as importações recentes
+@router.get("/", name="list_imports")
+def list_imports(request: Request):
+    get_current_user(request)
+    return [job.to_dict() for job in list_jobs()]
+
+
+# Rota 2: Progresso de uma importação (consultada periodicamente pelo cliente)
+@router.get("/{job_id}", name="show_import")
+def show_import(request: Request, job_id: str):
+    get_current_user(request)
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada.")
+    return job.to_dict()
+
+
+# Rota 3: Cancela uma importação em andamento
+@router.post("/{job_id}/cancel", name="cancel_import")
+def cancel_import(request: Request, job_id: str):
+    get_current_user(request)
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada.")
+    if not job.finished:
+        job.cancel()
+    return job.to_dict()
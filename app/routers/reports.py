@@ -0,0 +1,132 @@
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Request, HTTPException, Query, Depends
+
+# --- IMPORTAÇÕES DO BANCO DE DADOS (SQLAlchemy) ---
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from app.database import get_db
+from app.database_models import Client, Vehicle, Service
+# --------------------------------------------------
+from app.export_utils import ExportFilters
+from app.page_cache import cached_page
+from app.models.service import ServiceStatus
+from app import revenue_rollup
+
+# --- IMPORTAÇÃO DA FUNÇÃO DE AUTH ---
+from app.auth_utils import get_current_user
+# ------------------------------------
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+# --- TEMPLATES (ambiente Jinja2 compartilhado, app/templating.py) ---
+from app.templating import templates
+# ----------------------------------------------------
+
+DEFAULT_PERIOD_DAYS = 365      # sem filtro: últimos 12 meses
+DAILY_TABLE_MAX_DAYS = 62      # períodos maiores mostram só a tabela por mês
+
+
+# --- Consultas (também usadas por app/index_advisor.py) ---
+
+def dashboard_period(filters: ExportFilters) -> Tuple[date, date]:
+    """Período do painel: o filtro ou, sem ele, os últimos DEFAULT_PERIOD_DAYS dias."""
+    period_to = filters.date_to or date.today()
+    period_from = filters.date_from or (period_to - timedelta(days=DEFAULT_PERIOD_DAYS - 1))
+    return period_from, period_to
+
+
+def day_services_statement(filters: ExportFilters):
+    """
+    Mesmo filtro das exportações (date_from = date_to = dia): usa o índice
+    ix_services_start_date, ou (status, start_date) com status.
+    """
+    return (
+        select(Service, Vehicle.plate, Vehicle.model, Client.id.label("client_id"),
+               Client.name.label("client_name"))
+        .join(Vehicle, Service.vehicle_id == Vehicle.id)
+        .join(Client, Vehicle.client_id == Client.id)
+        .where(*filters.service_conditions())
+        .order_by(Service.id)
+    )
+
+
+# Rota 1: Painel de faturamento (lê só as tabelas de resumo)
+@router.get("/", name="reports")
+def reports_dashboard(
+    request: Request,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    username = get_current_user(request)
+    period_from, period_to = dashboard_period(ExportFilters(date_from, date_to))
+    if period_from > period_to:
+        raise HTTPException(status_code=400, detail="'date_from' deve ser anterior a 'date_to'.")
+
+    def _render():
+        conn = db.connection()
+        by_status = revenue_rollup.services_by_status(conn, period_from, period_to)
+        show_daily = (period_to - period_from).days < DAILY_TABLE_MAX_DAYS
+        months = revenue_rollup.revenue_by_month(conn, period_from, period_to)
+        days = revenue_rollup.revenue_by_day(conn, period_from, period_to) if show_daily else []
+
+        return templates.TemplateResponse(
+            "reports/dashboard.html",
+            {
+                "request": request,
+                "title": "Relatórios",
+                "username": username,
+                "date_from": period_from,
+                "date_to": period_to,
+                "by_status": by_status,
+                "total_services": sum(row["services"] for row in by_status),
+                "total_revenue": sum(row["revenue"] for row in months),
+                "average_ticket": revenue_rollup.average_ticket(by_status),
+                "months": months,
+                "max_month_revenue": max((row["revenue"] for row in months), default=0),
+                "show_daily": show_daily,
+                "days": days,
+                "max_day_revenue": max((row["revenue"] for row in days), default=0),
+                "top_clients": revenue_rollup.top_clients(conn, period_from, period_to),
+                "done_status": revenue_rollup.DONE_STATUS,
+            }
+        )
+
+    # Os resumos mudam junto com 'services' (triggers) e o nome dos clientes;
+    # sem filtro na URL o período depende do dia: entra na chave e no ETag
+    return cached_page(request, username, ("services", "clients"), _render,
+                       vary=(period_from, period_to))
+
+
+# Rota 2: Serviços de um dia (detalhe do painel)
+@router.get("/day/{day}", name="report_day")
+def report_day(
+    request: Request,
+    day: str,
+    service_status: Optional[str] = Query(None, alias="status"),
+    db: Session = Depends(get_db)
+):
+    username = get_current_user(request)
+    filters = ExportFilters(day, day, service_status)
+
+    def _render():
+        rows = db.execute(day_services_statement(filters)).all()
+
+        return templates.TemplateResponse(
+            "reports/day.html",
+            {
+                "request": request,
+                "title": f"Serviços de {filters.date_from.strftime('%d/%m/%Y')}",
+                "username": username,
+                "day": filters.date_from,
+                "status": filters.status,
+                "status_options": [e.value for e in ServiceStatus],
+                "rows": rows,
+                "total_revenue": sum(row.Service.price or 0 for row in rows
+                                     if row.Service.status == revenue_rollup.DONE_STATUS),
+            }
+        )
+
+    return cached_page(request, username, ("services", "vehicles", "clients"), _render)
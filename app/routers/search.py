@@ -0,0 +1,45 @@
+from typing import Optional
+from fastapi import APIRouter, Request, Depends
+from sqlalchemy.orm import Session
+
+# --- IMPORTAÇÕES DO BANCO DE DADOS (SQLAlchemy) ---
+from app.database import get_db
+from app.search_index import search, search_available
+# --------------------------------------------------
+
+# --- IMPORTAÇÃO DA FUNÇÃO DE AUTH ---
+from app.auth_utils import get_current_user
+# ------------------------------------
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+# --- TEMPLATES (ambiente Jinja2 compartilhado, app/templating.py) ---
+from app.templating import templates
+# ----------------------------------------------------
+
+
+# Rota 1: Busca textual em clientes, veículos e serviços
+@router.get("/", name="search")
+def search_all(request: Request, q: Optional[str] = None, db: Session = Depends(get_db)):
+    username = get_current_user(request)
+    query = (q or "").strip()
+
+    # SQLite sem FTS5: a tabela search_index não existe
+    available = search_available(db)
+
+    results = []
+    if query and available:
+        # Consulta no índice FTS5 (ranqueada), sem varrer as tabelas
+        results = search(db, query)
+
+    return templates.TemplateResponse(
+        "search/results.html",
+        {
+            "request": request,
+            "title": "Busca",
+            "q": query,
+            "results": results,
+            "available": available,
+            "username": username
+        }
+    )
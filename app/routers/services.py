@@ -1,16 +1,17 @@
-import sys
-from pathlib import Path
 from typing import Optional
-from fastapi import APIRouter, Request, Form, HTTPException
-from fastapi.templating import Jinja2Templates
+from urllib.parse import urlencode
+from fastapi import APIRouter, Request, Form, HTTPException, Query, Depends
 from starlette.responses import RedirectResponse
 from starlette import status as status_codes 
-from datetime import datetime
+from datetime import date
 
 # --- IMPORTAÇÕES DO BANCO DE DADOS (SQLAlchemy) ---
-from app.database import SessionLocal
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db
+from app.db_writer import db_writer
 # Importa os MODELOS DAS TABELAS
-from app.database_models import Vehicle, Service
+from app.database_models import Client, Vehicle, Service
+from sqlalchemy import select
 # --------------------------------------------------
 
 # --- IMPORTAÇÕES DE MODELOS (PYDANTIC) ---
@@ -22,35 +23,62 @@ from app.auth_utils import get_current_user
 # ------------------------------------
 # (Os imports do FAKE_DB foram removidos)
 
+from app.export_utils import ExportFilters, stream_export, fetch_rows
+from app.helpers.pagination import Page, keyset_paginate
+from app.page_cache import cached_page
+from app.service_stats import OPEN_STATUSES
+
 
 # Importação necessária para o redirecionamento
 from app.routers.vehicles import router as vehicles_router 
 
 router = APIRouter(prefix="/services", tags=["services"])
 
-# --- LÓGICA DE CAMINHO PARA PYINSTALLER (sem alteração) ---
-if getattr(sys, 'frozen', False):
-    BASE_DIR = Path(sys._MEIPASS) 
-else:
-    BASE_DIR = Path(".") 
-
-templates = Jinja2Templates(directory=BASE_DIR / "app" / "templates") 
+# --- TEMPLATES (ambiente Jinja2 compartilhado, app/templating.py) ---
+from app.templating import templates
 # ----------------------------------------------------
 
 
+# --- Consultas da fila e da exportação ---
+# (também usadas por app/index_advisor.py, que confere o plano de cada uma)
+
+def services_queue_page(db: Session, filters: ExportFilters, open_only: bool,
+                        after: Optional[str] = None, before: Optional[str] = None,
+                        limit: Optional[int] = None) -> Page:
+    """
+    Índice (status, start_date): cada status é um trecho já ordenado por
+    data, então a fila não percorre o histórico inteiro.
+    """
+    conditions = filters.service_conditions()
+    if open_only:
+        conditions.append(Service.status.in_(OPEN_STATUSES))
+    return keyset_paginate(
+        db.query(Service).options(
+            joinedload(Service.vehicle).joinedload(Vehicle.owner)
+        ).filter(*conditions),
+        [Service.start_date, Service.id],
+        after=after, before=before, limit=limit
+    )
+
+
+def export_services_statement(filters: ExportFilters):
+    return select(
+        Service.id, Service.start_date, Service.status, Service.description,
+        Service.price, Service.notes, Vehicle.plate, Vehicle.model, Client.name
+    ).join(Vehicle, Service.vehicle_id == Vehicle.id).join(
+        Client, Vehicle.client_id == Client.id
+    ).where(*filters.service_conditions()).order_by(Service.id)
+
+
 # Rota 1: Exibir Formulário de Novo Serviço (MODIFICADA)
 @router.get("/new/{vehicle_id}", name="new_service_form")
-def new_service_form(request: Request, vehicle_id: int):
+def new_service_form(request: Request, vehicle_id: int, db: Session = Depends(get_db)):
     username = get_current_user(request) # <--- PROTEGIDO
     
-    db = SessionLocal()
-    try:
-        # Busca o veículo no banco de dados real
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-        if not vehicle:
-            raise HTTPException(status_code=404, detail="Veículo não encontrado.")
-    finally:
-        db.close()
+    # Busca o veículo no banco de dados real
+    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado.")
     
     # Passa as opções de status para o template
     status_options = [e.value for e in ServiceStatus]
@@ -67,6 +95,81 @@ def new_service_form(request: Request, vehicle_id: int):
     )
 
 
+# Rota 1.1: Exportar Histórico de Serviços (CSV/XLSX em streaming)
+@router.get("/export", name="export_services")
+def export_services(
+    request: Request,
+    fmt: str = Query("csv", alias="format"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    service_status: Optional[str] = Query(None, alias="status"),
+):
+    get_current_user(request)
+    statement = export_services_statement(ExportFilters(date_from, date_to, service_status))
+
+    return stream_export(
+        fmt, "servicos",
+        ["ID", "Data", "Status", "Descrição", "Preço (R$)", "Observações",
+         "Placa", "Modelo", "Cliente"],
+        lambda db: fetch_rows(db, statement)
+    )
+
+
+# Rota 1.2: Fila de serviços da oficina (todos os veículos)
+# Sem filtro de status mostra os em aberto (PENDENTE / EM_ANDAMENTO), dos
+# mais antigos para os mais novos; STATUS_ALL mostra todos.
+STATUS_ALL = "TODOS"
+
+@router.get("/", name="list_services")
+def list_services(
+    request: Request,
+    service_status: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    username = get_current_user(request)
+    show_all = service_status == STATUS_ALL
+    filters = ExportFilters(date_from, date_to, None if show_all else service_status)
+
+    def _render():
+        # Sem status escolhido: só os em aberto
+        page = services_queue_page(db, filters, not filters.status and not show_all,
+                                   after=after, before=before, limit=limit)
+
+        # Filtros que seguem nos links de paginação
+        query = urlencode({key: value for key, value in (
+            ("status", service_status), ("date_from", date_from), ("date_to", date_to)
+        ) if value})
+        # A exportação aceita um status só (sem ele, exporta todos)
+        export_query = urlencode({key: value for key, value in (
+            ("status", filters.status), ("date_from", date_from), ("date_to", date_to)
+        ) if value})
+
+        return templates.TemplateResponse(
+            "services/list.html",
+            {
+                "request": request,
+                "title": "Fila de Serviços",
+                "services": page.items,
+                "page": page,
+                "query": query,
+                "export_query": export_query,
+                "status": service_status or "",
+                "status_all": STATUS_ALL,
+                "status_options": [e.value for e in ServiceStatus],
+                "date_from": date_from or "",
+                "date_to": date_to or "",
+                "username": username
+            }
+        )
+
+    return cached_page(request, username, ("services", "vehicles", "clients"), _render)
+
+
 # Rota 2: Processar Cadastro de Serviço (MODIFICADA)
 @router.post("/", name="create_service")
 def create_service(
@@ -75,14 +178,13 @@ def create_service(
     description: str = Form(...),
     status_str: str = Form(ServiceStatus.PENDENTE.value),
     price: float = Form(0.0),
-    observations: Optional[str] = Form(None), # 'observations' do formulário
+    observations: Optional[str] = Form(None) # 'observations' do formulário
 ):
     get_current_user(request) # <--- PROTEGIDO
     
-    db = SessionLocal()
-    try:
+    def _create(session):
         # 1. Verifica se o vehicle_id existe
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+        vehicle = session.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
         if not vehicle:
             raise HTTPException(status_code=400, detail="ID de Veículo inválido.")
 
@@ -93,7 +195,7 @@ def create_service(
             raise HTTPException(status_code=400, detail=f"Status inválido: {status_str}")
 
         # 3. Pega a data atual
-        current_date_only = datetime.now().strftime("%Y-%m-%d")
+        current_date_only = date.today()
 
         # 4. Cria o novo objeto Service
         # Nota: o campo no formulário é 'observations', mas no modelo é 'notes'
@@ -106,16 +208,14 @@ def create_service(
             notes=observations 
         )
         
-        # 5. Adiciona e salva no banco
-        db.add(new_service)
-        db.commit()
+        # 5. Adiciona (o commit é feito pela thread escritora)
+        session.add(new_service)
         
+    try:
+        db_writer.run(_create)
     except Exception as e:
-        db.rollback()
         print(f"Erro ao criar serviço: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao criar serviço: {e}")
-    finally:
-        db.close()
 
     # Redireciona de volta para a página de detalhes do veículo
     return RedirectResponse(
@@ -135,19 +235,14 @@ from starlette import status as status_codes
 
 # Rota 3: Exibir Formulário de EDIÇÃO de Serviço
 @router.get("/{service_id}/edit", name="edit_service_form")
-def edit_service_form(request: Request, service_id: int):
+def edit_service_form(request: Request, service_id: int, db: Session = Depends(get_db)):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        service = db.query(Service).filter(Service.id == service_id).first()
-        if not service:
-            raise HTTPException(status_code=404, detail="Serviço não encontrado.")
-            
-        status_options = [e.value for e in ServiceStatus]
+    service = db.query(Service).filter(Service.id == service_id).first()
+    if not service:
+        raise HTTPException(status_code=404, detail="Serviço não encontrado.")
         
-    finally:
-        db.close()
+    status_options = [e.value for e in ServiceStatus]
 
     return templates.TemplateResponse(
         "services/edit.html",
@@ -168,14 +263,13 @@ def update_service(
     description: str = Form(...),
     status_str: str = Form(...),
     price: float = Form(0.0),
-    observations: Optional[str] = Form(None),
+    observations: Optional[str] = Form(None)
 ):
     get_current_user(request)
     
-    db = SessionLocal()
-    try:
+    def _update(session):
         # 1. Busca o serviço existente
-        service_to_update = db.query(Service).filter(Service.id == service_id).first()
+        service_to_update = session.query(Service).filter(Service.id == service_id).first()
         if not service_to_update:
             raise HTTPException(status_code=404, detail="Serviço não encontrado.")
             
@@ -191,18 +285,15 @@ def update_service(
         service_to_update.price = price
         service_to_update.notes = observations
         
-        # 4. Salva no banco
-        db.commit()
-        
         # Pega o vehicle_id para o redirecionamento
-        vehicle_id = service_to_update.vehicle_id
+        return service_to_update.vehicle_id
         
+    try:
+        # 4. Salva no banco (thread escritora)
+        vehicle_id = db_writer.run(_update)
     except Exception as e:
-        db.rollback()
         print(f"Erro ao atualizar serviço: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar serviço: {e}")
-    finally:
-        db.close()
 
     # Redireciona de volta para a página do veículo
     return RedirectResponse(
@@ -218,24 +309,22 @@ def delete_service(
 ):
     get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        service_to_delete = db.query(Service).filter(Service.id == service_id).first()
+    def _delete(session):
+        service_to_delete = session.query(Service).filter(Service.id == service_id).first()
         if not service_to_delete:
             raise HTTPException(status_code=404, detail="Serviço não encontrado.")
         
         # Pega o vehicle_id ANTES de deletar, para saber para onde voltar
         vehicle_id = service_to_delete.vehicle_id
         
-        db.delete(service_to_delete)
-        db.commit()
+        session.delete(service_to_delete)
+        return vehicle_id
         
+    try:
+        vehicle_id = db_writer.run(_delete)
     except Exception as e:
-        db.rollback()
         print(f"Erro ao deletar serviço: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao deletar serviço: {e}")
-    finally:
-        db.close()
     
     return RedirectResponse(
         vehicles_router.url_path_for("show_vehicle", vehicle_id=vehicle_id), 
@@ -1,22 +1,28 @@
-import sys
-import shutil
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException
-from fastapi.templating import Jinja2Templates
-from starlette.responses import RedirectResponse
+from fastapi import APIRouter, Request, Form, UploadFile, File, HTTPException, Query, Depends
+from starlette.responses import RedirectResponse, JSONResponse
 from starlette import status
-import io
-import openpyxl 
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 # Adiciona 'joinedload' para otimizar queries com 'join'
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 # --- IMPORTAÇÕES DO BANCO DE DADOS (SQLAlchemy) ---
-from app.database import SessionLocal
+from app.database import get_db, get_async_db
+from app.db_writer import db_writer
 # Importa os MODELOS DAS TABELAS
 from app.database_models import Client, Vehicle, Service
 # --------------------------------------------------
+from app.helpers.pagination import Page, keyset_paginate
+from app.import_utils import IMPORT_EXTENSIONS, spool_upload
+from app.import_jobs import submit_import
+from app.export_utils import ExportFilters, stream_export, fetch_rows
+from app.image_utils import schedule_derivatives
+from app.upload_store import store_upload, release
+from app.page_cache import cached_page
 
 # --- IMPORTAÇÃO DA FUNÇÃO DE AUTH ---
 from app.auth_utils import get_current_user
@@ -25,30 +31,73 @@ from app.auth_utils import get_current_user
 
 router = APIRouter(prefix="/vehicles", tags=["vehicles"])
 
-# --- LÓGICA DE CAMINHO PARA PYINSTALLER (sem alteração) ---
-if getattr(sys, 'frozen', False):
-    BASE_DIR = Path(sys._MEIPASS) 
-else:
-    BASE_DIR = Path(".") 
-
-templates = Jinja2Templates(directory=BASE_DIR / "app" / "templates") 
-UPLOAD_DIR = Path("app/uploads/vehicles")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# --- TEMPLATES (ambiente Jinja2 compartilhado, app/templating.py) ---
+from app.templating import templates
 # ----------------------------------------------------
 
+
+# --- Consultas das páginas de veículo ---
+# (também usadas por app/index_advisor.py, que confere o plano de cada uma)
+
+def vehicles_page(db: Session, after: Optional[str] = None, before: Optional[str] = None,
+                  limit: Optional[int] = None) -> Page:
+    """Paginação por cursor sobre (model, id), com dono e resumo (joinedload)."""
+    return keyset_paginate(
+        db.query(Vehicle).options(joinedload(Vehicle.owner), joinedload(Vehicle.stats)),
+        [Vehicle.model, Vehicle.id],
+        after=after, before=before, limit=limit
+    )
+
+
+def load_vehicle_detail(db: Session, vehicle_id: int) -> Optional[Vehicle]:
+    return db.query(Vehicle).options(
+        joinedload(Vehicle.owner), joinedload(Vehicle.stats)
+    ).filter(Vehicle.id == vehicle_id).first()
+
+
+def vehicle_services_page(db: Session, vehicle_id: int, after: Optional[str] = None,
+                          before: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """
+    Histórico de serviços paginado, do mais recente para o mais antigo,
+    em vez de carregar todos os serviços do veículo de uma vez.
+    """
+    return keyset_paginate(
+        db.query(Service).filter(Service.vehicle_id == vehicle_id),
+        [Service.start_date, Service.id],
+        after=after, before=before, limit=limit, descending=True
+    )
+
+
+def client_choices_statement():
+    """Clientes do formulário de veículo, por nome."""
+    return select(Client).order_by(Client.name)
+
+
+def plate_owner_statement(plate: str):
+    """Veículo que já usa a placa (verificação de duplicidade)."""
+    return select(Vehicle.id).where(Vehicle.plate == plate)
+
+
+def export_vehicles_statement(filters: ExportFilters):
+    """Com filtros, só os veículos que têm serviços no período/status."""
+    statement = select(
+        Vehicle.id, Vehicle.plate, Vehicle.model, Vehicle.color, Vehicle.year,
+        Vehicle.client_id, Client.name, Vehicle.observations
+    ).join(Client, Vehicle.client_id == Client.id).order_by(Vehicle.id)
+    if filters.active:
+        statement = statement.where(filters.has_matching_service(Vehicle.id))
+    return statement
+
+
 # --- ROTAS PROTEGIDAS E MIGRADAS ---
 
 @router.get("/new/{client_id}", name="new_vehicle_form") 
-def new_vehicle_form_for_client(request: Request, client_id: int):
+def new_vehicle_form_for_client(request: Request, client_id: int, db: Session = Depends(get_db)):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        client = db.query(Client).filter(Client.id == client_id).first()
-        if not client:
-            raise HTTPException(status_code=404, detail="Cliente não encontrado.")
-    finally:
-        db.close()
+    client = db.query(Client).filter(Client.id == client_id).first()
+    if not client:
+        raise HTTPException(status_code=404, detail="Cliente não encontrado.")
     
     empty_vehicle = {
         "id": None, "client_id": client_id, "model": "", "plate": "",
@@ -67,14 +116,10 @@ def new_vehicle_form_for_client(request: Request, client_id: int):
     )
 
 @router.get("/new", name="new_vehicle_general") 
-def new_vehicle_form_general(request: Request):
+def new_vehicle_form_general(request: Request, db: Session = Depends(get_db)):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        clients_list = db.query(Client).order_by(Client.name).all()
-    finally:
-        db.close()
+    clients_list = db.execute(client_choices_statement()).scalars().all()
         
     empty_vehicle = {
         "id": None, "client_id": None, "model": "", "plate": "",
@@ -93,25 +138,49 @@ def new_vehicle_form_general(request: Request):
     )
 
 @router.get("/", name="list_vehicles")
-def list_vehicles(request: Request):
+def list_vehicles(
+    request: Request,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        vehicles_data = db.query(Vehicle).options(
-            joinedload(Vehicle.owner)
-        ).order_by(Vehicle.model).all()
-    finally:
-        db.close()
-        
-    return templates.TemplateResponse(
-        "vehicles/list.html",
-        {
-            "request": request, 
-            "vehicles": vehicles_data, 
-            "title": "Lista de Veículos",
-            "username": username
-        }
+    def _render():
+        page = vehicles_page(db, after=after, before=before, limit=limit)
+
+        return templates.TemplateResponse(
+            "vehicles/list.html",
+            {
+                "request": request, 
+                "vehicles": page.items, 
+                "page": page,
+                "title": "Lista de Veículos",
+                "username": username
+            }
+        )
+
+    # Lista refeita só quando veículos, donos ou miniaturas mudam
+    return cached_page(request, username, ("vehicles", "clients", "services", "photos"), _render)
+
+# Exportar Veículos (CSV/XLSX em streaming)
+# Com filtros, exporta só veículos que têm serviços no período/status
+@router.get("/export", name="export_vehicles")
+def export_vehicles(
+    request: Request,
+    fmt: str = Query("csv", alias="format"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    service_status: Optional[str] = Query(None, alias="status"),
+):
+    get_current_user(request)
+    statement = export_vehicles_statement(ExportFilters(date_from, date_to, service_status))
+
+    return stream_export(
+        fmt, "veiculos",
+        ["ID", "Placa", "Modelo", "Cor", "Ano", "ID Cliente", "Cliente", "Observações"],
+        lambda db: fetch_rows(db, statement)
     )
 
 # ⬇️⬇️ FUNÇÃO ATUALIZADA ⬇️⬇️
@@ -124,20 +193,21 @@ async def create_vehicle(
     color: str = Form(...),
     year: int = Form(...), 
     observations: Optional[str] = Form(None),
-    photo: Optional[UploadFile] = File(None)
+    photo: Optional[UploadFile] = File(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     get_current_user(request)
     
     # Padroniza a placa para a verificação
     plate_str = plate.upper().strip()
     
-    db = SessionLocal()
     try:
         # --- VERIFICAÇÃO DE DUPLICIDADE ---
-        existing_vehicle = db.query(Vehicle).filter(Vehicle.plate == plate_str).first()
+        # (rota async: consultas pela AsyncSession, sem travar o event loop)
+        existing_vehicle = (await db.execute(plate_owner_statement(plate_str))).first()
         if existing_vehicle:
             # A PLACA JÁ EXISTE! Recarrega o formulário com uma mensagem de erro.
-            clients_list = db.query(Client).order_by(Client.name).all()
+            clients_list = (await db.execute(client_choices_statement())).scalars().all()
             
             # Recria o "vehicle" com os dados que o usuário digitou
             form_data_error = {
@@ -158,41 +228,37 @@ async def create_vehicle(
             )
         # --- FIM DA VERIFICAÇÃO ---
 
-        client = db.query(Client).filter(Client.id == client_id).first()
-        if not client:
-            raise HTTPException(status_code=400, detail="ID de Cliente inválido.")
-        
-        new_vehicle = Vehicle(
-            client_id=client_id, model=model, plate=plate_str,
-            color=color, year=year, observations=observations, image_url=None
-        )
-        
-        db.add(new_vehicle)
-        db.commit()
-        db.refresh(new_vehicle)
-
+        # Foto validada (tamanho/tipo) e gravada antes do INSERT:
+        # o veículo já nasce com a foto, numa única escrita
         image_url = None
         if photo and photo.filename:
-            safe_filename = f"{new_vehicle.id}_{Path(photo.filename).name}" 
-            file_path = UPLOAD_DIR / safe_filename
             try:
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(photo.file, buffer)
-                image_url = f"/uploads/vehicles/{safe_filename}"
-                new_vehicle.image_url = image_url
-                db.commit()
-            except Exception as e:
-                print(f"Erro ao salvar a foto: {e}")
+                image_url = await store_upload(photo)
             finally:
                 await photo.close()
+
+        def _create(session):
+            client = session.query(Client).filter(Client.id == client_id).first()
+            if not client:
+                raise HTTPException(status_code=400, detail="ID de Cliente inválido.")
+            
+            new_vehicle = Vehicle(
+                client_id=client_id, model=model, plate=plate_str,
+                color=color, year=year, observations=observations, image_url=image_url
+            )
+            session.add(new_vehicle)
+            session.flush()
+            return new_vehicle.id
+        
+        await db_writer.run_async(_create)
+        schedule_derivatives(image_url)
                 
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         print(f"Erro ao criar veículo: {e}")
         # Esta é a linha que está a causar o seu erro 400
         raise HTTPException(status_code=400, detail=f"Erro ao criar veículo: {e}")
-    finally:
-        db.close()
 
     return RedirectResponse(
         router.url_path_for("list_vehicles"),
@@ -200,18 +266,14 @@ async def create_vehicle(
     )
 
 @router.get("/{vehicle_id}/edit", name="edit_vehicle_form")
-def edit_vehicle_form(request: Request, vehicle_id: int):
+def edit_vehicle_form(request: Request, vehicle_id: int, db: Session = Depends(get_db)):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
-        if not vehicle:
-            raise HTTPException(status_code=404, detail="Veículo não encontrado")
-        
-        clients_list = db.query(Client).order_by(Client.name).all()
-    finally:
-        db.close()
+    vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+    
+    clients_list = db.execute(client_choices_statement()).scalars().all()
     
     return templates.TemplateResponse(
         "vehicles/new.html", # Reutiliza o template de criação
@@ -235,26 +297,26 @@ async def update_vehicle(
     color: str = Form(...),
     year: int = Form(...), 
     observations: Optional[str] = Form(None),
-    photo: Optional[UploadFile] = File(None)
+    photo: Optional[UploadFile] = File(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     get_current_user(request)
     
     # Padroniza a placa
     plate_str = plate.upper().strip()
     
-    db = SessionLocal()
     try:
         # --- VERIFICAÇÃO DE DUPLICIDADE (PARA UPDATE) ---
-        existing_vehicle = db.query(Vehicle).filter(Vehicle.plate == plate_str).first()
+        existing_vehicle = (await db.execute(plate_owner_statement(plate_str))).first()
         
         # Se a placa existe E o ID é diferente do veículo que estamos editando
         if existing_vehicle and existing_vehicle.id != vehicle_id:
             # A PLACA JÁ EXISTE EM OUTRO CARRO!
             
-            clients_list = db.query(Client).order_by(Client.name).all()
+            clients_list = (await db.execute(client_choices_statement())).scalars().all()
             
             # Busca o veículo que o usuário tentava editar
-            vehicle_data_error = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+            vehicle_data_error = await db.get(Vehicle, vehicle_id)
             # Retorna o erro, mas mantém os dados que o usuário tentou salvar
             vehicle_data_error.plate = plate_str 
             
@@ -271,42 +333,45 @@ async def update_vehicle(
             )
         # --- FIM DA VERIFICAÇÃO ---
         
-        vehicle_to_update = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+        vehicle_to_update = await db.get(Vehicle, vehicle_id)
         if not vehicle_to_update:
             raise HTTPException(status_code=404, detail="Veículo não encontrado")
         
-        client = db.query(Client).filter(Client.id == client_id).first()
+        client = await db.get(Client, client_id)
         if not client:
             raise HTTPException(status_code=400, detail="ID de Cliente inválido.")
             
-        image_url = vehicle_to_update.image_url 
+        old_image_url = vehicle_to_update.image_url
+        image_url = old_image_url
         if photo and photo.filename:
-            safe_filename = f"{vehicle_id}_{Path(photo.filename).name}"
-            file_path = UPLOAD_DIR / safe_filename
             try:
-                with file_path.open("wb") as buffer:
-                    shutil.copyfileobj(photo.file, buffer)
-                image_url = f"/uploads/vehicles/{safe_filename}"
-            except Exception as e:
-                print(f"Erro ao salvar a nova foto: {e}")
+                image_url = await store_upload(photo)
             finally:
                 await photo.close()
                 
-        vehicle_to_update.client_id = client_id
-        vehicle_to_update.model = model
-        vehicle_to_update.plate = plate_str # Salva a placa padronizada
-        vehicle_to_update.color = color
-        vehicle_to_update.year = year
-        vehicle_to_update.observations = observations
-        vehicle_to_update.image_url = image_url
+        def _update(session):
+            vehicle = session.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+            if not vehicle:
+                raise HTTPException(status_code=404, detail="Veículo não encontrado")
+            vehicle.client_id = client_id
+            vehicle.model = model
+            vehicle.plate = plate_str # Salva a placa padronizada
+            vehicle.color = color
+            vehicle.year = year
+            vehicle.observations = observations
+            vehicle.image_url = image_url
         
-        db.commit()
+        await db_writer.run_async(_update)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         print(f"Erro ao atualizar veículo: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao atualizar veículo: {e}")
-    finally:
-        db.close()
+
+    if image_url != old_image_url:
+        schedule_derivatives(image_url)
+        # A foto antiga é apagada se nenhum outro veículo a usa (falhas vão para o log)
+        await run_in_threadpool(release, [old_image_url])
 
     return RedirectResponse(
         router.url_path_for("show_vehicle", vehicle_id=vehicle_id),
@@ -314,36 +379,42 @@ async def update_vehicle(
     )
 
 @router.get("/{vehicle_id}", name="show_vehicle")
-def show_vehicle(request: Request, vehicle_id: int):
+def show_vehicle(
+    request: Request,
+    vehicle_id: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
     username = get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        vehicle = db.query(Vehicle).options(
-            joinedload(Vehicle.owner),
-            joinedload(Vehicle.services)
-        ).filter(Vehicle.id == vehicle_id).first()
-        
+    def _render():
+        vehicle = load_vehicle_detail(db, vehicle_id)
+
         if not vehicle:
             raise HTTPException(status_code=404, detail="Veículo não encontrado")
 
         client = vehicle.owner
-        services_list = vehicle.services
-        
-    finally:
-        db.close()
 
-    return templates.TemplateResponse(
-        "vehicles/show.html",
-        {
-            "request": request, 
-            "vehicle": vehicle, 
-            "client": client,
-            "services": services_list,
-            "title": f"Detalhes: {vehicle.plate}",
-            "username": username
-        }
-    )
+        page = vehicle_services_page(db, vehicle_id, after=after, before=before, limit=limit)
+        services_list = page.items
+
+        return templates.TemplateResponse(
+            "vehicles/show.html",
+            {
+                "request": request, 
+                "vehicle": vehicle, 
+                "client": client,
+                "services": services_list,
+                "page": page,
+                "title": f"Detalhes: {vehicle.plate}",
+                "username": username
+            }
+        )
+
+    # Refeita só quando o veículo, o dono, os serviços ou as miniaturas mudam
+    return cached_page(request, username, ("vehicles", "clients", "services", "photos"), _render)
 
 @router.post("/{vehicle_id}/delete", name="delete_vehicle")
 def delete_vehicle(
@@ -352,19 +423,22 @@ def delete_vehicle(
 ):
     get_current_user(request)
     
-    db = SessionLocal()
-    try:
-        vehicle_to_delete = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+    def _delete(session):
+        vehicle_to_delete = session.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
         if not vehicle_to_delete:
             raise HTTPException(status_code=404, detail="Veículo não encontrado")
         
-        db.delete(vehicle_to_delete)
-        db.commit()
+        image_url = vehicle_to_delete.image_url
+        session.delete(vehicle_to_delete)
+        return image_url
+    
+    try:
+        image_url = db_writer.run(_delete)
     except Exception as e:
-        db.rollback()
         print(f"Erro ao deletar veículo: {e}")
-    finally:
-        db.close()
+    else:
+        # A foto é apagada se nenhum outro veículo a usa (falhas vão para o log)
+        release([image_url])
     
     return RedirectResponse(
         router.url_path_for("list_vehicles"),
@@ -376,57 +450,26 @@ async def import_vehicles(
     request: Request,
     excel_file: UploadFile = File(...)
 ):
-    get_current_user(request)
+    username = get_current_user(request)
     
-    if not excel_file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Arquivo inválido.")
+    suffix = Path(excel_file.filename or "").suffix.lower()
+    if suffix == ".xls":
+        raise HTTPException(status_code=400, detail="Planilhas .xls (Excel 97-2003) não são aceitas: "
+                                                    "salve como .xlsx ou .csv.")
+    if suffix not in IMPORT_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Arquivo inválido: envie .xlsx ou .csv.")
 
-    db = SessionLocal()
-    imported_count = 0
-    try:
-        in_memory_file = io.BytesIO(await excel_file.read())
-        workbook = openpyxl.load_workbook(in_memory_file)
-        sheet = workbook.active
-        rows = list(sheet.iter_rows(min_row=2, values_only=True))
-        
-        valid_client_ids = {row.id for row in db.query(Client.id).all()}
-        
-        vehicles_to_add = []
-        for row in rows:
-            if len(row) < 4 or not row[0]: continue
-            try:
-                client_id = int(row[0])
-            except (ValueError, TypeError):
-                continue
-                
-            if client_id not in valid_client_ids:
-                continue 
-            
-            plate = str(row[2]).upper() if row[2] else f"S/PLACA-{imported_count}"
-            
-            new_vehicle = Vehicle(
-                client_id=client_id,
-                model=str(row[1]) if row[1] else "N/A",
-                plate=plate,
-                color=str(row[3]) if row[3] else "N/A",
-                year=int(row[4]) if len(row) > 4 and row[4] and str(row[4]).isdigit() else 2000,
-                observations=str(row[5]) if len(row) > 5 and row[5] else None,
-                image_url=str(row[6]) if len(row) > 6 and row[6] else None
-            )
-            vehicles_to_add.append(new_vehicle)
-            imported_count += 1
-        
-        if vehicles_to_add:
-            db.bulk_save_objects(vehicles_to_add)
-            db.commit()
-            
-        return RedirectResponse(
-            router.url_path_for("list_vehicles"),
-            status_code=status.HTTP_303_SEE_OTHER,
-            headers={"X-Import-Success": str(imported_count)}
-        )
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro no processamento do arquivo: {e}")
-    finally:
-        db.close()
\ No newline at end of file
+    # 1. Copia o upload para o disco em blocos (memória constante)
+    spooled_path = await spool_upload(excel_file, suffix)
+    await excel_file.close()
+
+    # 2. A leitura e os INSERTs rodam num worker em segundo plano;
+    #    a resposta volta na hora com o id do job para acompanhar o progresso
+    job = submit_import(spooled_path, excel_file.filename, username)
+    status_url = request.app.url_path_for("show_import", job_id=job.id)
+
+    return JSONResponse(
+        {**job.to_dict(), "status_url": status_url},
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": status_url}
+    )
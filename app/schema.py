@@ -0,0 +1,160 @@
+import argparse
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+
+from app.database import Base
+from app import database_models  # noqa: F401  (registra as tabelas no Base.metadata)
+
+# ----------------------------------------------------
+# VERSÃO DO ESQUEMA DO BANCO
+# Em vez de rodar create_all (dezenas de consultas ao sqlite_master) e a
+# verificação do admin a cada abertura do programa, o banco guarda a
+# versão do esquema em PRAGMA user_version. Na inicialização só essa
+# versão é lida; os passos abaixo rodam uma única vez, quando o banco é
+# novo ou foi criado por uma versão anterior do programa.
+# Para mudar o esquema: acrescente um passo no fim da lista.
+# ----------------------------------------------------
+
+
+def _create_tables(engine) -> None:
+    # create_all não cria índices novos em tabelas que já existem
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _create_search_index(engine) -> None:
+    from app.search_index import setup_search_index
+    # Sem FTS5 o passo não falha: o resto do programa funciona e a rota
+    # /search mostra "busca indisponível" (search_available)
+    if not setup_search_index(engine):
+        print("Aviso: SQLite sem FTS5, a busca ficará indisponível.")
+
+
+def _create_service_stats(engine) -> None:
+    from app.service_stats import setup_service_stats
+    _create_tables(engine)
+    setup_service_stats(engine)
+
+
+def _create_revenue_rollup(engine) -> None:
+    from app.revenue_rollup import setup_revenue_rollup
+    _create_tables(engine)
+    setup_revenue_rollup(engine)
+
+
+def _convert_service_dates(engine) -> None:
+    # services.start_date passou de String para Date. No SQLite as duas são
+    # texto, então basta deixar todas as datas no formato AAAA-MM-DD que o
+    # tipo Date lê (os triggers de resumo já comparam nesse formato).
+    with engine.begin() as conn:
+        # 'AAAA-MM-DD HH:MM[:SS]' -> 'AAAA-MM-DD'
+        conn.execute(text(
+            "UPDATE services SET start_date = date(start_date) "
+            "WHERE date(start_date) IS NOT NULL AND start_date <> date(start_date)"
+        ))
+        # 'DD/MM/AAAA' -> 'AAAA-MM-DD'
+        conn.execute(text(
+            "UPDATE services SET start_date = "
+            "substr(start_date, 7, 4) || '-' || substr(start_date, 4, 2) || '-' || substr(start_date, 1, 2) "
+            "WHERE start_date GLOB '[0-3][0-9]/[01][0-9]/[0-9][0-9][0-9][0-9]*'"
+        ))
+        invalid = conn.execute(text(
+            "SELECT id FROM services WHERE date(start_date) IS NULL OR date(start_date) <> start_date"
+        )).scalars().all()
+    if invalid:
+        # Falha o passo: user_version continua em 5 e a conversão roda de
+        # novo na próxima abertura, depois de corrigidas as datas
+        raise RuntimeError(
+            f"{len(invalid)} serviço(s) com data inválida (ids: {invalid[:20]}); "
+            "corrija para AAAA-MM-DD e rode 'python -m app.schema migrate'."
+        )
+    _create_tables(engine)
+
+
+def _create_cache_versions(engine) -> None:
+    from app.page_cache import setup_cache_versions
+    _create_tables(engine)
+    setup_cache_versions(engine)
+
+
+def _create_admin_user(engine) -> None:
+    from app.auth_utils import create_admin_user_if_not_exists
+    create_admin_user_if_not_exists()
+
+
+# (versão, descrição, função que recebe o engine)
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "tabelas e índices", _create_tables),
+    (2, "índice de busca (FTS5)", _create_search_index),
+    (3, "usuário admin padrão", _create_admin_user),
+    (4, "totais de serviços por veículo e cliente", _create_service_stats),
+    (5, "faturamento diário dos relatórios", _create_revenue_rollup),
+    (6, "datas dos serviços como Date e índice (status, start_date)", _convert_service_dates),
+    (7, "índices de vehicles.client_id e vehicles.image_url", _create_tables),
+    (8, "versões do cache de páginas compartilhadas entre processos", _create_cache_versions),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def _set_schema_version(engine, version: int) -> None:
+    with engine.begin() as conn:
+        # PRAGMA não aceita parâmetro; a versão é sempre um int nosso
+        conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def pending_migrations(engine) -> List[Tuple[int, str]]:
+    """Passos ainda não aplicados neste banco (versão, descrição)."""
+    current = get_schema_version(engine)
+    return [(version, description) for version, description, _ in MIGRATIONS if version > current]
+
+
+def ensure_schema(engine) -> int:
+    """
+    Deixa o banco na versão SCHEMA_VERSION. Se já estiver, custa uma
+    única leitura de PRAGMA. Retorna quantos passos foram aplicados.
+    """
+    current = get_schema_version(engine)
+    if current >= SCHEMA_VERSION:
+        return 0
+
+    applied = 0
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Atualizando o banco para a versão {version}: {description}...")
+        step(engine)
+        _set_schema_version(engine, version)
+        applied += 1
+    return applied
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.schema status | migrate
+    # 'migrate' aplica os passos pendentes num oficina.db existente (o
+    # programa também faz isso sozinho ao abrir); 'status' só mostra.
+    parser = argparse.ArgumentParser(description="Versão do esquema do banco (PRAGMA user_version).")
+    parser.add_argument("command", choices=("status", "migrate"))
+    args = parser.parse_args()
+
+    from app.database import DB_FILE, engine
+    pending = pending_migrations(engine)
+    print(f"{DB_FILE}: versão {get_schema_version(engine)} de {SCHEMA_VERSION}.")
+    if args.command == "status":
+        for version, description in pending:
+            print(f"  pendente: {version} - {description}")
+    else:
+        try:
+            applied = ensure_schema(engine)
+        except RuntimeError as e:
+            print(f"Erro na atualização do banco: {e}")
+            raise SystemExit(1)
+        print(f"{applied} passo(s) aplicado(s); banco na versão {get_schema_version(engine)}.")
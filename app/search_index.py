@@ -0,0 +1,153 @@
+import re
+from typing import List, Dict, Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# ----------------------------------------------------
+# ÍNDICE DE BUSCA (SQLite FTS5)
+# Uma única tabela virtual indexa clientes, veículos e serviços.
+# O rowid codifica o tipo e o id da linha original (id * 4 + tipo),
+# assim os triggers atualizam/removem a entrada por rowid, sem varrer o índice.
+# ----------------------------------------------------
+KIND_CLIENT = 1
+KIND_VEHICLE = 2
+KIND_SERVICE = 3
+
+KIND_NAMES = {KIND_CLIENT: "client", KIND_VEHICLE: "vehicle", KIND_SERVICE: "service"}
+
+# Se o índice existe neste banco (None = ainda não verificado). Sem FTS5 a
+# migração segue adiante e a rota /search mostra "busca indisponível".
+_available: Optional[bool] = None
+
+# Expressões SQL do conteúdo indexado de cada tabela (usadas nos triggers e no rebuild)
+_CLIENT_BODY = "coalesce({t}.phone, '') || ' ' || coalesce({t}.email, '')"
+_VEHICLE_TITLE = "{t}.plate || ' ' || {t}.model"
+_VEHICLE_BODY = "coalesce({t}.color, '') || ' ' || coalesce({t}.observations, '')"
+_SERVICE_BODY = "coalesce({t}.notes, '')"
+
+_CREATE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    parent_id UNINDEXED,
+    title,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+
+def _columns(kind: int, t: str) -> str:
+    """Expressões (rowid, parent_id, title, body) da linha `t` (new, old ou a tabela)."""
+    if kind == KIND_CLIENT:
+        parent, title, body = "NULL", f"{t}.name", _CLIENT_BODY.format(t=t)
+    elif kind == KIND_VEHICLE:
+        parent, title = f"{t}.client_id", _VEHICLE_TITLE.format(t=t)
+        body = _VEHICLE_BODY.format(t=t)
+    else:
+        parent, title, body = f"{t}.vehicle_id", f"{t}.description", _SERVICE_BODY.format(t=t)
+    return f"{t}.id * 4 + {kind}, {parent}, {title}, {body}"
+
+
+def _entry(kind: int, t: str) -> str:
+    return (
+        "INSERT INTO search_index(rowid, parent_id, title, body) "
+        f"VALUES ({_columns(kind, t)});"
+    )
+
+
+def _triggers(table: str, kind: int) -> List[str]:
+    delete = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {kind};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} "
+        f"BEGIN {_entry(kind, 'new')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} "
+        f"BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE ON {table} "
+        f"BEGIN {delete} {_entry(kind, 'new')} END",
+    ]
+
+
+_TABLES = [("clients", KIND_CLIENT), ("vehicles", KIND_VEHICLE), ("services", KIND_SERVICE)]
+
+
+def rebuild_search_index(conn) -> None:
+    """Recria todo o conteúdo do índice a partir das tabelas."""
+    conn.execute(text("DELETE FROM search_index"))
+    for table, kind in _TABLES:
+        conn.execute(text(
+            "INSERT INTO search_index(rowid, parent_id, title, body) "
+            f"SELECT {_columns(kind, table)} FROM {table}"
+        ))
+
+
+def setup_search_index(engine) -> bool:
+    """
+    Cria a tabela FTS5 e os triggers de sincronização (idempotente).
+    Se o índice acabou de ser criado sobre um banco com dados, popula ele.
+    Retorna False se o SQLite não tiver suporte a FTS5.
+    """
+    global _available
+    try:
+        with engine.begin() as conn:
+            existed = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'search_index'"
+            )).first() is not None
+            conn.execute(text(_CREATE_TABLE))
+            for table, kind in _TABLES:
+                for ddl in _triggers(table, kind):
+                    conn.execute(text(ddl))
+            if not existed:
+                rebuild_search_index(conn)
+    except OperationalError as e:
+        print(f"Busca desativada (FTS5 indisponível): {e}")
+        _available = False
+        return False
+    _available = True
+    return True
+
+
+def search_available(db) -> bool:
+    """
+    Diz se o índice de busca existe. A migração só roda uma vez, então nas
+    aberturas seguintes a resposta vem do sqlite_master (lido uma vez só).
+    """
+    global _available
+    if _available is None:
+        _available = db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'search_index'"
+        )).first() is not None
+    return _available
+
+
+def _match_expression(query: str) -> str:
+    """
+    Transforma o texto digitado numa expressão FTS5 segura:
+    cada palavra vira um termo entre aspas com busca por prefixo.
+    """
+    tokens = re.findall(r"\w+", query, flags=re.UNICODE)
+    return " ".join(f'"{tok}"*' for tok in tokens)
+
+
+def search(db, query: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Busca ranqueada (bm25, título pesa mais que o corpo) no índice."""
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    rows = db.execute(
+        text(
+            "SELECT rowid, parent_id, title, body FROM search_index "
+            "WHERE search_index MATCH :q "
+            "ORDER BY bm25(search_index, 0.0, 10.0, 1.0) LIMIT :limit"
+        ),
+        {"q": expression, "limit": limit},
+    ).all()
+    return [
+        {
+            "kind": KIND_NAMES[row.rowid % 4],
+            "id": row.rowid // 4,
+            "parent_id": row.parent_id,
+            "title": row.title,
+            "body": row.body.strip() if row.body else "",
+        }
+        for row in rows
+    ]
@@ -0,0 +1,166 @@
+import argparse
+from typing import List
+
+from sqlalchemy import text
+
+from app.models.service import ServiceStatus
+
+# ----------------------------------------------------
+# RESUMO DOS SERVIÇOS POR VEÍCULO E POR CLIENTE
+# vehicle_service_stats / client_service_stats guardam quantidade de
+# serviços, quantos estão em aberto, total cobrado e data do último.
+# Triggers do SQLite aplicam só a diferença de cada INSERT/UPDATE/DELETE
+# em 'services' (o mesmo esquema do índice de busca), então ler os totais
+# é uma linha por chave, sem percorrer os serviços.
+# A data do último serviço só é recalculada quando o serviço removido era
+# o mais recente; o recálculo usa o índice (vehicle_id, start_date).
+# ----------------------------------------------------
+OPEN_STATUSES = (ServiceStatus.PENDENTE.value, ServiceStatus.EM_ANDAMENTO.value)
+_OPEN_LIST = ", ".join(f"'{s}'" for s in OPEN_STATUSES)
+
+_STAT_TABLES = ("vehicle_service_stats", "client_service_stats")
+
+# Cliente dono do veículo do serviço `t` (new/old)
+_CLIENT_OF = "(SELECT client_id FROM vehicles WHERE id = {t}.vehicle_id)"
+
+# Data mais recente entre os veículos (já atualizados) de um cliente
+_CLIENT_LAST_DATE = (
+    "(SELECT max(vs.last_service_date) FROM vehicle_service_stats vs "
+    "JOIN vehicles v ON v.id = vs.vehicle_id WHERE v.client_id = {client})"
+)
+
+
+def _add_service(t: str) -> str:
+    """Soma o serviço `t` aos totais do veículo e do cliente."""
+    is_open = f"({t}.status IN ({_OPEN_LIST}))"
+    price = f"coalesce({t}.price, 0)"
+    newer = (f"CASE WHEN last_service_date IS NULL OR {t}.start_date > last_service_date "
+             f"THEN {t}.start_date ELSE last_service_date END")
+    client = _CLIENT_OF.format(t=t)
+    return f"""
+        INSERT OR IGNORE INTO vehicle_service_stats(vehicle_id) VALUES ({t}.vehicle_id);
+        UPDATE vehicle_service_stats SET
+            service_count = service_count + 1,
+            open_count = open_count + {is_open},
+            total_billed = total_billed + {price},
+            last_service_date = {newer}
+        WHERE vehicle_id = {t}.vehicle_id;
+        INSERT OR IGNORE INTO client_service_stats(client_id) SELECT {client} WHERE {client} IS NOT NULL;
+        UPDATE client_service_stats SET
+            service_count = service_count + 1,
+            open_count = open_count + {is_open},
+            total_billed = total_billed + {price},
+            last_service_date = {newer}
+        WHERE client_id = {client};
+    """
+
+
+def _remove_service(t: str) -> str:
+    """Tira o serviço `t` dos totais; a data só é recalculada se era a mais recente."""
+    is_open = f"({t}.status IN ({_OPEN_LIST}))"
+    price = f"coalesce({t}.price, 0)"
+    client = _CLIENT_OF.format(t=t)
+    vehicle_last = (f"CASE WHEN {t}.start_date < last_service_date THEN last_service_date "
+                    f"ELSE (SELECT max(start_date) FROM services WHERE vehicle_id = {t}.vehicle_id) END")
+    client_last = (f"CASE WHEN {t}.start_date < last_service_date THEN last_service_date "
+                   f"ELSE {_CLIENT_LAST_DATE.format(client=client)} END")
+    return f"""
+        UPDATE vehicle_service_stats SET
+            service_count = service_count - 1,
+            open_count = open_count - {is_open},
+            total_billed = total_billed - {price},
+            last_service_date = {vehicle_last}
+        WHERE vehicle_id = {t}.vehicle_id;
+        UPDATE client_service_stats SET
+            service_count = service_count - 1,
+            open_count = open_count - {is_open},
+            total_billed = total_billed - {price},
+            last_service_date = {client_last}
+        WHERE client_id = {client};
+    """
+
+
+def _move_vehicle() -> str:
+    """Veículo trocou de dono: os totais dele saem de um cliente e vão para o outro."""
+    column = "(SELECT {c} FROM vehicle_service_stats WHERE vehicle_id = new.id)"
+    count, open_, total = (column.format(c=c) for c in ("service_count", "open_count", "total_billed"))
+    return f"""
+        UPDATE client_service_stats SET
+            service_count = service_count - {count},
+            open_count = open_count - {open_},
+            total_billed = total_billed - {total},
+            last_service_date = {_CLIENT_LAST_DATE.format(client="old.client_id")}
+        WHERE client_id = old.client_id;
+        INSERT OR IGNORE INTO client_service_stats(client_id) VALUES (new.client_id);
+        UPDATE client_service_stats SET
+            service_count = service_count + {count},
+            open_count = open_count + {open_},
+            total_billed = total_billed + {total},
+            last_service_date = {_CLIENT_LAST_DATE.format(client="new.client_id")}
+        WHERE client_id = new.client_id;
+    """
+
+
+def _triggers() -> List[str]:
+    return [
+        "CREATE TRIGGER IF NOT EXISTS services_stats_ai AFTER INSERT ON services "
+        f"BEGIN {_add_service('new')} END",
+        "CREATE TRIGGER IF NOT EXISTS services_stats_ad AFTER DELETE ON services "
+        f"BEGIN {_remove_service('old')} END",
+        "CREATE TRIGGER IF NOT EXISTS services_stats_au "
+        "AFTER UPDATE OF vehicle_id, status, price, start_date ON services "
+        f"BEGIN {_remove_service('old')} {_add_service('new')} END",
+        "CREATE TRIGGER IF NOT EXISTS vehicles_stats_au AFTER UPDATE OF client_id ON vehicles "
+        "WHEN old.client_id IS NOT new.client_id AND "
+        "EXISTS (SELECT 1 FROM vehicle_service_stats WHERE vehicle_id = new.id) "
+        f"BEGIN {_move_vehicle()} END",
+        "CREATE TRIGGER IF NOT EXISTS vehicles_stats_ad AFTER DELETE ON vehicles "
+        "BEGIN DELETE FROM vehicle_service_stats WHERE vehicle_id = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS clients_stats_ad AFTER DELETE ON clients "
+        "BEGIN DELETE FROM client_service_stats WHERE client_id = old.id; END",
+    ]
+
+
+def rebuild_service_stats(conn) -> None:
+    """Recalcula todos os totais a partir da tabela 'services'."""
+    for table in _STAT_TABLES:
+        conn.execute(text(f"DELETE FROM {table}"))
+    aggregates = (
+        "count(*), "
+        f"coalesce(sum(s.status IN ({_OPEN_LIST})), 0), "
+        "coalesce(sum(coalesce(s.price, 0)), 0), "
+        "max(s.start_date)"
+    )
+    conn.execute(text(
+        "INSERT INTO vehicle_service_stats"
+        "(vehicle_id, service_count, open_count, total_billed, last_service_date) "
+        f"SELECT s.vehicle_id, {aggregates} FROM services s GROUP BY s.vehicle_id"
+    ))
+    conn.execute(text(
+        "INSERT INTO client_service_stats"
+        "(client_id, service_count, open_count, total_billed, last_service_date) "
+        f"SELECT v.client_id, {aggregates} FROM services s "
+        "JOIN vehicles v ON v.id = s.vehicle_id GROUP BY v.client_id"
+    ))
+
+
+def setup_service_stats(engine) -> None:
+    """Cria os triggers (idempotente) e recalcula os totais."""
+    with engine.begin() as conn:
+        for ddl in _triggers():
+            conn.execute(text(ddl))
+        rebuild_service_stats(conn)
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.service_stats rebuild
+    parser = argparse.ArgumentParser(description="Totais de serviços por veículo e cliente.")
+    parser.add_argument("command", choices=("rebuild",))
+    parser.parse_args()
+
+    from app.database import engine
+    setup_service_stats(engine)
+    with engine.connect() as conn:
+        vehicles = conn.execute(text("SELECT count(*) FROM vehicle_service_stats")).scalar()
+        clients = conn.execute(text("SELECT count(*) FROM client_service_stats")).scalar()
+    print(f"Totais recalculados: {vehicles} veículo(s), {clients} cliente(s).")
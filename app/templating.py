@@ -0,0 +1,91 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.assets import asset_url
+from app.helpers.formatters import format_brl_date, format_brl_price
+from app.image_utils import photo_srcset, photo_url
+from app.metrics import TimedTemplate
+
+# ----------------------------------------------------
+# AMBIENTE JINJA2 ÚNICO
+# Todos os roteadores usam este mesmo 'templates': um só cache de
+# templates compilados, filtros e globais registrados uma vez.
+# O bytecode compilado também vai para disco (app/template_cache), então
+# um processo novo não recompila os templates a partir do fonte.
+# 'python -m app.templating precompile' preenche esse diretório antes do
+# build do PyInstaller, que o empacota junto com os templates.
+# ----------------------------------------------------
+if getattr(sys, 'frozen', False):
+    BASE_DIR = Path(sys._MEIPASS)
+else:
+    BASE_DIR = Path(".")
+
+TEMPLATES_DIR = BASE_DIR / "app" / "templates"
+TEMPLATE_CACHE_DIR = BASE_DIR / "app" / "template_cache"
+
+
+class PortableBytecodeCache(FileSystemBytecodeCache):
+    """
+    O Jinja2 usa o caminho absoluto do template na chave do cache; no
+    executável esse caminho muda a cada execução (pasta temporária do
+    PyInstaller). Aqui a chave é só o nome do template, para o cache
+    gerado no build continuar valendo. O conteúdo continua conferido
+    pelo checksum do fonte.
+    """
+
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(name)
+
+
+def _bytecode_cache():
+    try:
+        TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        print(f"Erro ao criar o cache de templates ({e}); compilando em memória.")
+        return None
+    return PortableBytecodeCache(str(TEMPLATE_CACHE_DIR), pattern="%s.jinja.cache")
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=True,
+    bytecode_cache=_bytecode_cache(),
+    # No executável os templates nunca mudam: não confere a data dos arquivos
+    auto_reload=not getattr(sys, 'frozen', False),
+)
+
+# Soma o tempo de render() nas métricas da requisição (app/metrics.py)
+env.template_class = TimedTemplate
+
+env.filters["brl_price"] = format_brl_price
+env.filters["brl_date"] = format_brl_date
+env.globals["asset_url"] = asset_url
+env.globals["photo_url"] = photo_url
+env.globals["photo_srcset"] = photo_srcset
+
+templates = Jinja2Templates(env=env)
+
+
+def precompile() -> int:
+    """Compila todos os templates para o cache em disco. Retorna quantos."""
+    names = env.list_templates(extensions=("html",))
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.templating precompile   (antes do pyinstaller)
+    parser = argparse.ArgumentParser(description="Templates Jinja2.")
+    parser.add_argument("command", choices=("precompile",))
+    parser.parse_args()
+
+    started = time.perf_counter()
+    total = precompile()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{total} template(s) compilado(s) em {TEMPLATE_CACHE_DIR} ({elapsed:.0f} ms).")
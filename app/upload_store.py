@@ -0,0 +1,380 @@
+import argparse
+import hashlib
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.database import SessionLocal
+from app.database_models import Vehicle
+from app.image_utils import (
+    BLOB_DIR, DERIVED_DIR_NAME, PHOTO_FORMATS, PHOTO_SIZES, UPLOAD_ROOT,
+    derivative_path, forget_derivatives, generate_derivatives, path_to_url, url_to_path,
+)
+
+# ----------------------------------------------------
+# ARMAZENAMENTO DAS FOTOS POR CONTEÚDO
+# Cada foto é gravada uma única vez, com o nome igual ao SHA-256 do
+# conteúdo, em subpastas (blobs/ab/cd/abcd...jpg) para não encher um
+# diretório só. Fotos iguais viram o mesmo arquivo. As referências são
+# as colunas Vehicle.image_url: um arquivo que nenhum veículo usa pode
+# ser apagado (na hora, ao trocar/excluir a foto, ou pela varredura gc).
+# ----------------------------------------------------
+LEGACY_DIRS = (UPLOAD_ROOT / "vehicles",)   # uploads antigos, nomeados por veículo
+COPY_CHUNK_BYTES = 1024 * 1024
+
+# Limite de tamanho das fotos (OFICINA_MAX_PHOTO_MB, padrão 10 MB) e tipos
+# aceitos. O tipo é conferido pelos primeiros bytes do arquivo, não só pelo
+# Content-Type informado pelo navegador; a extensão gravada vem daí.
+MAX_PHOTO_BYTES = int(os.environ.get("OFICINA_MAX_PHOTO_MB", "10")) * 1024 * 1024
+PHOTO_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"RIFF", ".webp"),   # conferido junto com 'WEBP' no byte 8
+)
+ALLOWED_PHOTO_TYPES = {"image/jpeg", "image/png", "image/webp", "application/octet-stream"}
+
+# Rotas que recebem foto (cadastro e edição de veículo) e a folga para os
+# outros campos do formulário e os cabeçalhos do multipart
+PHOTO_UPLOAD_PATHS = re.compile(r"^/vehicles/(?:\d+/update)?$")
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Um arquivo recém-gravado ainda pode não ter chegado ao banco (o upload
+# termina antes do UPDATE do veículo). Arquivos mais novos que isso não
+# são apagados; a próxima varredura cuida deles.
+ORPHAN_GRACE_SECONDS = 10 * 60
+
+
+def blob_path(digest: str, suffix: str) -> Path:
+    """Caminho do blob: blobs/<2 primeiros>/<2 seguintes>/<hash><ext>."""
+    return BLOB_DIR / digest[:2] / digest[2:4] / f"{digest}{suffix}"
+
+
+def _normalize_suffix(suffix: str) -> str:
+    suffix = (suffix or "").lower()
+    if suffix == ".jpeg":
+        suffix = ".jpg"
+    return suffix if suffix.startswith(".") or not suffix else f".{suffix}"
+
+
+class BlobWriter:
+    """
+    Grava um upload num temporário calculando o SHA-256 durante a cópia.
+    commit() move o arquivo para o nome definitivo (ou descarta o
+    temporário, se o conteúdo já existir) e devolve a URL.
+    """
+
+    def __init__(self, suffix: str):
+        self.suffix = _normalize_suffix(suffix)
+        self.size = 0
+        self._hash = hashlib.sha256()
+        BLOB_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".upload-", suffix=".tmp", dir=BLOB_DIR)
+        self._tmp_path = Path(tmp)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> str:
+        self._file.close()
+        target = blob_path(self._hash.hexdigest(), self.suffix)
+        if target.exists():
+            # Conteúdo repetido: reaproveita o arquivo existente e renova
+            # o mtime para a varredura não apagá-lo antes do UPDATE
+            self._tmp_path.unlink(missing_ok=True)
+            os.utime(target)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._tmp_path, target)
+        return path_to_url(target)
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+
+def store_stream(source: BinaryIO, suffix: str) -> str:
+    """Grava o conteúdo de `source` no armazenamento e devolve a URL."""
+    writer = BlobWriter(suffix)
+    try:
+        while True:
+            chunk = source.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def _sniff_photo_suffix(head: bytes) -> Optional[str]:
+    for signature, suffix in PHOTO_SIGNATURES:
+        if head.startswith(signature):
+            if suffix == ".webp" and head[8:12] != b"WEBP":
+                return None
+            return suffix
+    return None
+
+
+async def store_upload(upload, max_bytes: Optional[int] = None) -> str:
+    """
+    Recebe a foto de um UploadFile em blocos e devolve a URL no armazenamento.
+    A leitura é assíncrona e a gravação/hash rodam no threadpool, então um
+    upload grande não trava o event loop. Levanta HTTPException 413 (grande
+    demais) ou 415 (não é imagem aceita) sem deixar arquivo para trás.
+    """
+    max_bytes = max_bytes or MAX_PHOTO_BYTES
+    limit_mb = max_bytes // (1024 * 1024)
+    # PhotoUploadLimitMiddleware já recusou corpos grandes demais; isto e o
+    # limite por bloco abaixo são a última defesa
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Foto maior que {limit_mb} MB.")
+    if upload.content_type and upload.content_type not in ALLOWED_PHOTO_TYPES:
+        raise HTTPException(status_code=415, detail="Envie uma foto JPEG, PNG ou WebP.")
+
+    head = await upload.read(COPY_CHUNK_BYTES)
+    suffix = _sniff_photo_suffix(head)
+    if suffix is None:
+        raise HTTPException(status_code=415, detail="Envie uma foto JPEG, PNG ou WebP.")
+
+    started = time.monotonic()
+    writer = await run_in_threadpool(BlobWriter, suffix)
+    try:
+        chunk = head
+        while chunk:
+            if writer.size + len(chunk) > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Foto maior que {limit_mb} MB.")
+            await run_in_threadpool(writer.write, chunk)
+            chunk = await upload.read(COPY_CHUNK_BYTES)
+        url = await run_in_threadpool(writer.commit)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"Foto gravada: {writer.size} bytes em {elapsed:.3f}s "
+          f"({writer.size / elapsed / 1024:.0f} KiB/s) -> {url}")
+    return url
+
+
+class PhotoUploadLimitMiddleware:
+    """
+    Recusa com 413 as fotos grandes demais antes do Starlette receber o
+    multipart: pelo Content-Length, sem ler o corpo; sem ele (chunked),
+    contando os bytes recebidos e parando no limite.
+    """
+
+    def __init__(self, app, max_body_bytes: Optional[int] = None, paths=PHOTO_UPLOAD_PATHS):
+        self.app = app
+        self.max_body_bytes = max_body_bytes or MAX_PHOTO_BYTES + FORM_OVERHEAD_BYTES
+        self.paths = paths
+
+    def _detail(self) -> str:
+        return f"Foto maior que {MAX_PHOTO_BYTES // (1024 * 1024)} MB."
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.paths.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > self.max_body_bytes:
+            response = JSONResponse({"detail": self._detail()}, status_code=413,
+                                    headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Sai do request.form() do FastAPI como está: vira o 413
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# --- Referências e remoção ---
+
+def _referenced_urls(db) -> Set[str]:
+    rows = db.execute(select(Vehicle.image_url).where(Vehicle.image_url.isnot(None)).distinct())
+    return {url for (url,) in rows}
+
+
+def _is_managed(path: Path) -> bool:
+    """Só apaga dentro de UPLOAD_ROOT (caminho real, já com links resolvidos)."""
+    try:
+        resolved = path.resolve()
+    except (OSError, RuntimeError):
+        return False
+    if not resolved.is_relative_to(UPLOAD_ROOT.resolve()):
+        return False
+    return any(resolved.is_relative_to(root.resolve()) and resolved != root.resolve()
+               for root in (BLOB_DIR, *LEGACY_DIRS))
+
+
+def _remove_photo(path: Path) -> int:
+    """Apaga a foto e as miniaturas dela. Retorna os bytes liberados."""
+    forget_derivatives(path)
+    freed = 0
+    targets = [path] + [derivative_path(path, size, fmt)
+                        for size in PHOTO_SIZES for fmt in PHOTO_FORMATS]
+    for target in targets:
+        try:
+            size = target.stat().st_size
+            target.unlink()
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
+
+
+def _is_recent(path: Path, now: float) -> bool:
+    try:
+        return now - path.stat().st_mtime < ORPHAN_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def release(image_urls: Iterable[Optional[str]]) -> int:
+    """
+    Chamado depois que uma foto deixou de ser usada (troca ou exclusão).
+    Apaga os arquivos que nenhum veículo referencia mais. Retorna os bytes liberados.
+    A gravação no banco já terminou: uma foto que não pôde ser apagada vai
+    para a saída (a varredura gc tenta de novo) e não derruba a requisição.
+    """
+    candidates = {url for url in image_urls if url}
+    if not candidates:
+        return 0
+    freed = 0
+    now = time.time()
+    db = SessionLocal()
+    try:
+        for url in candidates:
+            try:
+                path = url_to_path(url)
+                if path is None or not _is_managed(path) or _is_recent(path, now):
+                    continue
+                in_use = db.execute(
+                    select(Vehicle.id).where(Vehicle.image_url == url).limit(1)
+                ).first()
+                if not in_use:
+                    freed += _remove_photo(path)
+            except Exception as e:
+                print(f"Erro ao liberar a foto {url}: {e}")
+    finally:
+        db.close()
+    return freed
+
+
+def collect_garbage(dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Varre os diretórios de fotos e apaga o que nenhum veículo referencia
+    (incluindo miniaturas cuja foto original já não existe).
+    Retorna (arquivos removidos, bytes liberados).
+    """
+    db = SessionLocal()
+    try:
+        referenced = _referenced_urls(db)
+    finally:
+        db.close()
+
+    now = time.time()
+    removed = freed = 0
+    for root in (BLOB_DIR, *LEGACY_DIRS):
+        if not root.exists():
+            continue
+        files = [p for p in root.rglob("*") if p.is_file()]
+        # Originais antes das miniaturas: as da foto apagada saem na mesma varredura
+        files.sort(key=lambda p: (p.parent.name == DERIVED_DIR_NAME, str(p)))
+        for path in files:
+            if _is_recent(path, now):
+                continue
+            if path.parent.name == DERIVED_DIR_NAME:
+                # Miniatura: some junto com a original
+                original = path.parent.parent / path.name.rsplit(".", 2)[0]
+                orphan = not original.exists()
+            else:
+                orphan = path_to_url(path) not in referenced
+            if not orphan:
+                continue
+            size = path.stat().st_size
+            if not dry_run:
+                forget_derivatives(path)
+                path.unlink()
+            removed += 1
+            freed += size
+
+    if not dry_run and BLOB_DIR.exists():
+        # Subpastas que ficaram vazias (mais profundas primeiro)
+        for directory in sorted((p for p in BLOB_DIR.rglob("*") if p.is_dir()), reverse=True):
+            if not any(directory.iterdir()):
+                directory.rmdir()
+    return removed, freed
+
+
+def migrate_legacy() -> int:
+    """
+    Move as fotos antigas (uploads/vehicles/<id>_<nome>) para o
+    armazenamento por conteúdo, gera as miniaturas do blob e atualiza os
+    veículos. Os arquivos antigos ficam sem referência e saem na próxima
+    varredura.
+    """
+    db = SessionLocal()
+    migrated = 0
+    try:
+        vehicles = db.query(Vehicle).filter(Vehicle.image_url.isnot(None)).all()
+        for vehicle in vehicles:
+            path = url_to_path(vehicle.image_url)
+            if path is None or BLOB_DIR in path.parents or not path.is_file():
+                continue
+            with path.open("rb") as source:
+                vehicle.image_url = store_stream(source, path.suffix)
+            # As miniaturas antigas ficaram ao lado do arquivo antigo
+            generate_derivatives(url_to_path(vehicle.image_url))
+            migrated += 1
+        db.commit()
+    finally:
+        db.close()
+    return migrated
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+if __name__ == "__main__":
+    # Uso: python -m app.upload_store migrate | gc [--dry-run]
+    parser = argparse.ArgumentParser(description="Manutenção das fotos enviadas.")
+    parser.add_argument("command", choices=("gc", "migrate"))
+    parser.add_argument("--dry-run", action="store_true", help="Só informa o que seria apagado.")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        print(f"{migrate_legacy()} foto(s) migrada(s) para {BLOB_DIR}.")
+        print("Rode 'gc' depois do prazo de segurança para apagar os arquivos antigos.")
+    else:
+        removed, freed = collect_garbage(dry_run=args.dry_run)
+        verb = "seriam removidos" if args.dry_run else "removidos"
+        print(f"{removed} arquivo(s) {verb}, {_format_bytes(freed)} liberados.")
@@ -0,0 +1,4 @@
+# Ferramentas de medição de desempenho (não fazem parte do executável).
+# - generate_data: cria um oficina.db de teste com dados sintéticos
+# - load_test: usuários virtuais contra o servidor, relatório em JSON
+# - micro: micro-benchmarks com base gravada (benchmarks/baseline.json)
@@ -0,0 +1,213 @@
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+# ----------------------------------------------------
+# DADOS SINTÉTICOS DE OFICINA
+# Preenche um oficina.db de teste (nunca o da oficina) com clientes,
+# veículos e serviços com cara de verdade: placas nos padrões antigo
+# (ABC-1234) e Mercosul (ABC1D23), preços em reais por tipo de serviço e
+# status coerentes com a data (serviços antigos quase todos concluídos).
+# Grava pelas tabelas de app/database_models.py, em lotes, com os
+# triggers de resumo/busca ligados como em produção.
+#
+# Uso:
+#   python -m benchmarks.generate_data --clients 100000 --services 1000000
+# ----------------------------------------------------
+DEFAULT_DB = Path("benchmarks") / "data" / "oficina.db"
+BATCH_ROWS = 5000
+
+FIRST_NAMES = (
+    "Ana", "Antônio", "Beatriz", "Bruno", "Camila", "Carlos", "Daniela", "Diego",
+    "Eduarda", "Felipe", "Fernanda", "Gabriel", "Helena", "Igor", "Isabela", "João",
+    "Juliana", "Lucas", "Luiza", "Marcos", "Maria", "Mateus", "Natália", "Paulo",
+    "Pedro", "Rafael", "Renata", "Rodrigo", "Sofia", "Thiago", "Vanessa", "Vinícius",
+)
+LAST_NAMES = (
+    "Almeida", "Alves", "Barbosa", "Cardoso", "Carvalho", "Costa", "Dias", "Ferreira",
+    "Gomes", "Lima", "Martins", "Melo", "Oliveira", "Pereira", "Ribeiro", "Rocha",
+    "Rodrigues", "Santos", "Silva", "Souza", "Teixeira", "Vieira",
+)
+AREA_CODES = (11, 12, 19, 21, 27, 31, 41, 47, 48, 51, 61, 62, 71, 81, 85, 91)
+MODELS = (
+    "Gol", "Onix", "HB20", "Strada", "Argo", "Mobi", "Kwid", "Polo", "T-Cross",
+    "Compass", "Renegade", "Corolla", "Civic", "Hilux", "S10", "Saveiro", "Uno",
+    "Palio", "Fox", "Celta", "Sandero", "Tracker", "Creta", "Kicks",
+)
+COLORS = ("Branco", "Prata", "Preto", "Cinza", "Vermelho", "Azul", "Marrom", "Verde")
+
+# (descrição, preço mínimo, preço máximo) em R$
+SERVICE_TYPES = (
+    ("Troca de óleo e filtro", 120, 350),
+    ("Alinhamento e balanceamento", 80, 200),
+    ("Revisão dos freios", 250, 900),
+    ("Troca de pastilhas de freio", 180, 450),
+    ("Troca do kit de embreagem", 900, 2800),
+    ("Suspensão dianteira", 600, 2200),
+    ("Diagnóstico eletrônico", 100, 250),
+    ("Troca de correia dentada", 450, 1200),
+    ("Higienização e carga do ar-condicionado", 150, 400),
+    ("Revisão completa", 500, 1800),
+    ("Troca de bateria", 350, 800),
+    ("Funilaria e pintura", 800, 4500),
+)
+
+# Status por idade do serviço: antigos quase todos concluídos, recentes em aberto
+RECENT_DAYS = 30
+OLD_STATUS_WEIGHTS = {"CONCLUIDO": 88, "CANCELADO": 7, "EM_ANDAMENTO": 3, "PENDENTE": 2}
+RECENT_STATUS_WEIGHTS = {"PENDENTE": 35, "EM_ANDAMENTO": 35, "CONCLUIDO": 25, "CANCELADO": 5}
+
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_PLATE_SPACE = 26 ** 3 * 10 * 26 * 100      # combinações Mercosul
+_PLATE_STEP = 7919                           # primo: espalha as placas sem repetir
+
+
+def plate_for(index: int) -> str:
+    """Placa única para o índice: 3/4 no padrão Mercosul, 1/4 no antigo."""
+    if index % 4 == 3:
+        n = (index // 4 * _PLATE_STEP) % (26 ** 3 * 10000)
+        letters, digits = divmod(n, 10000)
+        return f"{_letters(letters)}-{digits:04d}"
+    n = (index * _PLATE_STEP) % _PLATE_SPACE
+    n, last_digits = divmod(n, 100)
+    n, letter = divmod(n, 26)
+    letters, digit = divmod(n, 10)
+    return f"{_letters(letters)}{digit}{_LETTERS[letter]}{last_digits:02d}"
+
+
+def _letters(n: int) -> str:
+    return "".join(_LETTERS[(n // 26 ** i) % 26] for i in (2, 1, 0))
+
+
+def _weighted(rng: random.Random, weights: Dict[str, int]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _batches(rows: Iterator[dict]) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def client_rows(rng: random.Random, count: int, first_id: int) -> Iterator[dict]:
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        number = first_id + i
+        yield {
+            "name": f"{first} {last} {rng.choice(LAST_NAMES)}",
+            "phone": f"({rng.choice(AREA_CODES)}) 9{rng.randint(1000, 9999)}-{rng.randint(0, 9999):04d}",
+            # ~10% sem email; o número garante a unicidade
+            "email": None if rng.random() < 0.1 else f"{first}.{last}{number}@exemplo.com.br".lower(),
+        }
+
+
+def vehicle_rows(rng: random.Random, count: int, client_ids: List[int], first_index: int) -> Iterator[dict]:
+    current_year = date.today().year
+    for i in range(count):
+        yield {
+            "client_id": rng.choice(client_ids),
+            "model": rng.choice(MODELS),
+            "plate": plate_for(first_index + i),
+            "color": rng.choice(COLORS),
+            "year": rng.randint(current_year - 25, current_year),
+            "observations": None,
+            "image_url": None,
+        }
+
+
+def service_rows(rng: random.Random, count: int, vehicle_ids: List[int], years: int) -> Iterator[dict]:
+    today = date.today()
+    span_days = years * 365
+    for _ in range(count):
+        # Mais serviços recentes que antigos (a oficina cresce)
+        age = int(span_days * rng.random() ** 1.5)
+        start = today - timedelta(days=age)
+        weights = RECENT_STATUS_WEIGHTS if age <= RECENT_DAYS else OLD_STATUS_WEIGHTS
+        description, low, high = rng.choice(SERVICE_TYPES)
+        yield {
+            "vehicle_id": rng.choice(vehicle_ids),
+            "description": description,
+            "start_date": start,
+            "status": _weighted(rng, weights),
+            "price": round(rng.uniform(low, high), 2),
+            "notes": None,
+        }
+
+
+def generate(clients: int, vehicles: int, services: int, years: int, seed: int) -> Dict[str, int]:
+    """Acrescenta os registros ao banco de OFICINA_DB. Retorna os totais no banco."""
+    from sqlalchemy import func, insert, select
+
+    from app.database import engine
+    from app.database_models import Client, Service, Vehicle
+    from app.schema import ensure_schema
+
+    ensure_schema(engine)
+    rng = random.Random(seed)
+
+    def _insert(table, rows, label):
+        started = time.perf_counter()
+        total = 0
+        for batch in _batches(rows):
+            with engine.begin() as conn:
+                conn.execute(insert(table), batch)
+            total += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {total} em {elapsed:.1f} s ({total / elapsed if elapsed else 0:.0f}/s)")
+
+    with engine.connect() as conn:
+        first_client = (conn.execute(select(func.max(Client.id))).scalar() or 0) + 1
+        vehicle_offset = conn.execute(select(func.count()).select_from(Vehicle.__table__)).scalar()
+
+    _insert(Client.__table__, client_rows(rng, clients, first_client), "clientes")
+    with engine.connect() as conn:
+        client_ids = conn.execute(select(Client.id)).scalars().all()
+    _insert(Vehicle.__table__, vehicle_rows(rng, vehicles, client_ids, vehicle_offset), "veículos")
+    with engine.connect() as conn:
+        vehicle_ids = conn.execute(select(Vehicle.id)).scalars().all()
+    _insert(Service.__table__, service_rows(rng, services, vehicle_ids, years), "serviços")
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    with engine.connect() as conn:
+        return {
+            table.name: conn.execute(select(func.count()).select_from(table)).scalar()
+            for table in (Client.__table__, Vehicle.__table__, Service.__table__)
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um oficina.db de teste com dados sintéticos.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help=f"arquivo do banco (padrão: {DEFAULT_DB})")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--vehicles", type=int, default=None, help="padrão: 1,5 por cliente")
+    parser.add_argument("--services", type=int, default=10000)
+    parser.add_argument("--years", type=int, default=5, help="anos de histórico de serviços")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="apaga o banco antes de gerar")
+    args = parser.parse_args()
+
+    db_path = args.db.resolve()
+    if args.reset:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Antes de importar o app: a engine é criada com o caminho do banco
+    os.environ["OFICINA_DB"] = str(db_path)
+
+    started = time.perf_counter()
+    totals = generate(
+        args.clients,
+        args.vehicles if args.vehicles is not None else args.clients * 3 // 2,
+        args.services, args.years, args.seed,
+    )
+    print(f"{db_path}: {totals} ({time.perf_counter() - started:.1f} s)")
@@ -0,0 +1,407 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.generate_data import DEFAULT_DB, SERVICE_TYPES, plate_for
+
+# ----------------------------------------------------
+# TESTE DE CARGA
+# Usuários virtuais (threads, só biblioteca padrão) fazem login e repetem
+# um roteiro ponderado pelas rotas reais: listas e detalhes de clientes e
+# veículos, fila de serviços, relatórios, busca, cadastro/edição de
+# serviços e importação de veículos. Sem --url, sobe um uvicorn local
+# apontando para o banco de teste (OFICINA_DB).
+# O resultado sai em JSON (p50/p95/p99, vazão e taxa de erro por rota)
+# para comparar um build com outro.
+#
+# Uso:
+#   python -m benchmarks.generate_data --clients 100000 --services 1000000
+#   python -m benchmarks.load_test --users 20 --duration 60 --output resultado.json
+# ----------------------------------------------------
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SERVER_START_TIMEOUT = 60
+REQUEST_TIMEOUT = 30
+SAMPLE_IDS = 5000                 # ids sorteados do banco para as rotas de detalhe
+IMPORT_ROWS = 50                  # veículos por arquivo importado
+
+# (nome da rota no relatório, peso no roteiro)
+SCENARIO: List[Tuple[str, int]] = [
+    ("list_clients", 12),
+    ("list_clients_next", 4),
+    ("show_client", 14),
+    ("list_vehicles", 10),
+    ("show_vehicle", 18),
+    ("list_services", 8),
+    ("reports", 4),
+    ("search", 6),
+    ("create_service", 10),
+    ("update_service", 6),
+    ("import_vehicles", 1),
+]
+WRITE_ROUTES = {"create_service", "update_service", "import_vehicles"}
+
+
+class Recorder:
+    """Latências e erros por rota, compartilhado pelas threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: Dict[str, str] = {}
+
+    def add(self, route: str, seconds: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.latencies.setdefault(route, []).append(seconds)
+            if error:
+                self.errors[route] = self.errors.get(route, 0) + 1
+                self.error_samples.setdefault(route, error)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil pelo posto mais próximo (values já ordenada)."""
+    if not values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+# --- Cliente HTTP (http.client com keep-alive e o cookie da sessão) ---
+
+class VirtualUser:
+    def __init__(self, base_url: str, rng: random.Random):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.rng = rng
+        self.cookie: Optional[str] = None
+        self.conn: Optional[http.client.HTTPConnection] = None
+        self.next_clients_cursor: Optional[str] = None
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                content_type: Optional[str] = None) -> Tuple[int, Dict[str, str], bytes]:
+        headers = {"Connection": "keep-alive"}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        if content_type:
+            headers["Content-Type"] = content_type
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Conexão keep-alive fechada pelo servidor: reabre uma vez
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        response_headers = {k.lower(): v for k, v in response.getheaders()}
+        set_cookie = response_headers.get("set-cookie")
+        if set_cookie:
+            self.cookie = set_cookie.split(";", 1)[0]
+        return response.status, response_headers, data
+
+    def login(self, username: str, password: str, deadline: float) -> None:
+        body = urlencode({"username": username, "password": password}).encode()
+        while True:
+            status, headers, _ = self.request("POST", "/login", body, "application/x-www-form-urlencoded")
+            if status == 303:
+                return
+            # 503 (fila do hash cheia) / 429: espera o Retry-After e tenta de novo
+            if status in (429, 503) and time.monotonic() < deadline:
+                time.sleep(float(headers.get("retry-after", "1")) * self.rng.uniform(0.5, 1.5))
+                continue
+            raise RuntimeError(f"login falhou: HTTP {status}")
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+
+def _form(fields: dict) -> Tuple[bytes, str]:
+    return urlencode(fields).encode(), "application/x-www-form-urlencoded"
+
+
+def _multipart(field: str, filename: str, content: bytes, content_type: str) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# --- Roteiro ---
+
+class Workload:
+    """Ids de amostra do banco de teste e a montagem de cada requisição."""
+
+    def __init__(self, db_path: Path, seed: int):
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            def _ids(table: str) -> List[int]:
+                return [row[0] for row in conn.execute(
+                    f"SELECT id FROM {table} ORDER BY random() LIMIT {SAMPLE_IDS}")]
+            self.client_ids = _ids("clients")
+            self.vehicle_ids = _ids("vehicles")
+            self.service_ids = _ids("services")
+        finally:
+            conn.close()
+        if not (self.client_ids and self.vehicle_ids):
+            raise SystemExit(f"{db_path} sem clientes/veículos; rode antes: python -m benchmarks.generate_data")
+        self._plate_counter = 0
+        self._plate_lock = threading.Lock()
+        self.run_id = uuid.uuid4().int % 10 ** 6
+        self.seed = seed
+
+    def _import_file(self, rng: random.Random) -> bytes:
+        lines = ["client_id;modelo;placa;cor;ano"]
+        with self._plate_lock:
+            start = self._plate_counter
+            self._plate_counter += IMPORT_ROWS
+        for i in range(IMPORT_ROWS):
+            # Placas bem além das geradas pelo generate_data (não colidem)
+            plate = plate_for(10 ** 8 + self.run_id * 10 ** 4 + start + i)
+            lines.append(f"{rng.choice(self.client_ids)};Gol;{plate};Prata;2015")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def step(self, user: VirtualUser, route: str) -> Tuple[int, int]:
+        """Faz a requisição da rota. Retorna (status obtido, status esperado)."""
+        rng = user.rng
+        if route == "list_clients":
+            status, _, body = user.request("GET", "/clients/")
+            user.next_clients_cursor = _find_cursor(body, "/clients/")
+            return status, 200
+        if route == "list_clients_next":
+            path = f"/clients/?after={user.next_clients_cursor}" if user.next_clients_cursor else "/clients/"
+            status, _, body = user.request("GET", path)
+            user.next_clients_cursor = _find_cursor(body, "/clients/")
+            return status, 200
+        if route == "show_client":
+            return user.request("GET", f"/clients/{rng.choice(self.client_ids)}")[0], 200
+        if route == "list_vehicles":
+            return user.request("GET", "/vehicles/")[0], 200
+        if route == "show_vehicle":
+            return user.request("GET", f"/vehicles/{rng.choice(self.vehicle_ids)}")[0], 200
+        if route == "list_services":
+            return user.request("GET", "/services/")[0], 200
+        if route == "reports":
+            return user.request("GET", "/reports/")[0], 200
+        if route == "search":
+            term = rng.choice(("silva", "gol", "onix", "ana", "troca", "freio"))
+            return user.request("GET", f"/search/?q={term}")[0], 200
+        if route == "create_service":
+            description, low, high = rng.choice(SERVICE_TYPES)
+            body, content_type = _form({
+                "vehicle_id": rng.choice(self.vehicle_ids), "description": description,
+                "status_str": "PENDENTE", "price": f"{rng.uniform(low, high):.2f}",
+            })
+            return user.request("POST", "/services/", body, content_type)[0], 303
+        if route == "update_service":
+            if not self.service_ids:
+                return self.step(user, "create_service")
+            description, low, high = rng.choice(SERVICE_TYPES)
+            body, content_type = _form({
+                "description": description, "status_str": rng.choice(("EM_ANDAMENTO", "CONCLUIDO")),
+                "price": f"{rng.uniform(low, high):.2f}",
+            })
+            return user.request("POST", f"/services/{rng.choice(self.service_ids)}/update",
+                                body, content_type)[0], 303
+        if route == "import_vehicles":
+            body, content_type = _multipart("excel_file", "carga.csv", self._import_file(rng), "text/csv")
+            return user.request("POST", "/vehicles/import", body, content_type)[0], 202
+        raise ValueError(route)
+
+
+def _find_cursor(body: bytes, prefix: str) -> Optional[str]:
+    marker = f"{prefix}?after=".encode()
+    start = body.find(marker)
+    if start < 0:
+        return None
+    start += len(marker)
+    end = body.find(b"&", start)
+    return body[start:end].decode("ascii", "replace") if end > 0 else None
+
+
+def run_user(base_url: str, workload: Workload, recorder: Recorder, index: int,
+             credentials: Tuple[str, str], stop_at: float, routes: List[Tuple[str, int]]) -> None:
+    rng = random.Random(workload.seed * 1000 + index)
+    user = VirtualUser(base_url, rng)
+    names = [name for name, _ in routes]
+    weights = [weight for _, weight in routes]
+    try:
+        started = time.perf_counter()
+        error = None
+        try:
+            user.login(*credentials, deadline=time.monotonic() + SERVER_START_TIMEOUT)
+        except Exception as e:
+            error = str(e)
+        recorder.add("login", time.perf_counter() - started, error)
+        if error:
+            return
+        while time.monotonic() < stop_at:
+            route = rng.choices(names, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                status, expected = workload.step(user, route)
+                error = None if status == expected else f"HTTP {status} (esperado {expected})"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            recorder.add(route, time.perf_counter() - started, error)
+    finally:
+        user.close()
+
+
+# --- Servidor local ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: Path, workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {**os.environ, "OFICINA_DB": str(db_path)}
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn terminou com código {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/login")
+            conn.getresponse().read()
+            conn.close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("uvicorn não respondeu a tempo")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(base_url: str, db_path: Path, users: int, duration: float, seed: int,
+        credentials: Tuple[str, str], read_only: bool) -> dict:
+    workload = Workload(db_path, seed)
+    recorder = Recorder()
+    routes = [(name, weight) for name, weight in SCENARIO if not (read_only and name in WRITE_ROUTES)]
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    started = time.perf_counter()
+    stop_at = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=run_user, name=f"vu-{i}", daemon=True,
+                         args=(base_url, workload, recorder, i, credentials, stop_at, routes))
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "meta": {
+            "started_at": started_at,
+            "commit": _git_commit(),
+            "url": base_url,
+            "database": str(db_path),
+            "users": users,
+            "duration_s": round(elapsed, 2),
+            "read_only": read_only,
+            "seed": seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "total": _summary(all_latencies, sum(recorder.errors.values()), elapsed),
+        "routes": {
+            route: {**_summary(values, recorder.errors.get(route, 0), elapsed),
+                    **({"first_error": recorder.error_samples[route]}
+                       if route in recorder.error_samples else {})}
+            for route, values in sorted(recorder.latencies.items())
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga com usuários virtuais.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="banco de teste (ids das rotas de detalhe)")
+    parser.add_argument("--url", help="servidor já no ar (sem isto, sobe um uvicorn local com --db)")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30, help="segundos")
+    parser.add_argument("--workers", type=int, default=1, help="processos do uvicorn local")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--read-only", action="store_true", help="só rotas de leitura")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="arquivo JSON (padrão: só na saída padrão)")
+    args = parser.parse_args()
+
+    db_path = args.db.resolve()
+    if not db_path.exists():
+        raise SystemExit(f"{db_path} não existe; rode antes: python -m benchmarks.generate_data")
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_server(db_path, args.workers)
+    try:
+        report = run(base_url.rstrip("/"), db_path, args.users, args.duration, args.seed,
+                     (args.username, args.password), args.read_only)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
@@ -0,0 +1,440 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import timeit
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# ----------------------------------------------------
+# MICRO-BENCHMARKS COM LINHA DE BASE
+# Mede funções e formatos de consulta isolados, num banco de teste
+# pequeno e sempre igual (generate_data com semente fixa), e compara com
+# benchmarks/baseline.json:
+# - tempo por operação acima da base + tolerância => regressão. A
+#   velocidade desta máquina muda durante a própria execução, então o
+#   tempo comparado é relativo: cada amostra (várias operações, pelo
+#   menos MIN_BATCH_SECONDS) é dividida por uma calibração de Python puro
+#   medida logo antes e logo depois dela, e vale a mediana das amostras;
+# - número de comandos SQL por operação acima da base => regressão (pega
+#   N+1 e carga preguiçosa esquecida, independente da máquina).
+# Um benchmark acima do limite é medido de novo (RETRIES vezes, fica o
+# melhor tempo) antes de ser acusado: uma regressão de verdade não some.
+# Sai com código 1 se houver regressão.
+# A base depende da máquina: gere-a na mesma máquina da comparação.
+#
+# Uso:
+#   python -m benchmarks.micro                    # compara com a base
+#   python -m benchmarks.micro --update-baseline  # grava a base atual
+# ----------------------------------------------------
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.25          # 25% mais lento que a base = regressão
+REPEAT = 7
+RETRIES = 2
+MIN_BATCH_SECONDS = 0.1
+
+# Banco de teste: pequeno, para a suíte rodar em segundos
+DATA_CLIENTS = 500
+DATA_VEHICLES = 750
+DATA_SERVICES = 10000
+DATA_SEED = 7
+LOOP_ITEMS = 10000                # itens dos laços de formatação/importação
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], Callable[[], object]]   # devolve a função medida
+    tolerance: Optional[float] = None            # sobrepõe a tolerância padrão
+
+
+@dataclass
+class Result:
+    name: str
+    seconds: float                 # por operação (mediana)
+    relative: float                # por operação, em unidades da calibração (mediana)
+    queries: int                   # comandos SQL por operação
+
+
+# --- Contagem de SQL ---
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@contextmanager
+def counting_queries(engine):
+    from sqlalchemy import event
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+# --- Benchmarks ---
+
+def _formatters_parse():
+    from app.helpers.formatters import parse_brl_price
+    rng = random.Random(1)
+    values = [rng.choice((f"{rng.uniform(0, 9999):,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
+                          round(rng.uniform(0, 5000), 2), rng.randint(0, 3000)))
+              for _ in range(LOOP_ITEMS)]
+    return lambda: [parse_brl_price(value) for value in values]
+
+
+def _formatters_format():
+    from app.helpers.formatters import format_brl_price
+    rng = random.Random(2)
+    values = [rng.uniform(0, 250000) for _ in range(LOOP_ITEMS)]
+    return lambda: [format_brl_price(value) for value in values]
+
+
+def _import_mapping():
+    # O laço de import_vehicle_rows: linha da planilha -> colunas de 'vehicles'
+    from app.import_utils import map_vehicle_row
+    rng = random.Random(3)
+    client_ids = set(range(1, DATA_CLIENTS + 1))
+    rows = [(str(rng.randint(1, DATA_CLIENTS + 50)), "Gol", f"BEN{i:04d}", "Prata",
+             str(rng.randint(1995, 2025)), None, None) for i in range(LOOP_ITEMS)]
+    return lambda: [map_vehicle_row(row, client_ids, i) for i, row in enumerate(rows)]
+
+
+def _session_call(fn):
+    from app.database import SessionLocal
+
+    def _run():
+        db = SessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+    return _run
+
+
+def _sample_vehicle_id() -> int:
+    from sqlalchemy import func, select
+    from app.database import engine
+    from app.database_models import Service
+    with engine.connect() as conn:
+        # Veículo com mais serviços: o histórico paginado tem mais de uma página
+        return conn.execute(
+            select(Service.vehicle_id).group_by(Service.vehicle_id)
+            .order_by(func.count().desc()).limit(1)
+        ).scalar()
+
+
+def _list_vehicles_orm():
+    from sqlalchemy.orm import joinedload
+    from app.database_models import Vehicle
+    from app.helpers.pagination import keyset_paginate
+
+    def _query(db):
+        page = keyset_paginate(
+            db.query(Vehicle).options(joinedload(Vehicle.owner), joinedload(Vehicle.stats)),
+            [Vehicle.model, Vehicle.id]
+        )
+        return [(v.plate, v.owner.name, v.stats.service_count if v.stats else 0) for v in page.items]
+    return _session_call(_query)
+
+
+def _list_vehicles_core():
+    from sqlalchemy import select
+    from app.database_models import Client, Vehicle, VehicleServiceStats
+    from app.helpers.pagination import DEFAULT_PAGE_SIZE
+
+    statement = (
+        select(Vehicle.id, Vehicle.plate, Vehicle.model, Vehicle.color, Vehicle.image_url,
+               Client.name, VehicleServiceStats.service_count, VehicleServiceStats.open_count)
+        .join(Client, Vehicle.client_id == Client.id)
+        .outerjoin(VehicleServiceStats, VehicleServiceStats.vehicle_id == Vehicle.id)
+        .order_by(Vehicle.model, Vehicle.id).limit(DEFAULT_PAGE_SIZE + 1)
+    )
+    return _session_call(lambda db: db.execute(statement).all())
+
+
+def _show_vehicle_orm():
+    from sqlalchemy.orm import joinedload
+    from app.database_models import Service, Vehicle
+    from app.helpers.pagination import keyset_paginate
+    vehicle_id = _sample_vehicle_id()
+
+    def _query(db):
+        vehicle = db.query(Vehicle).options(
+            joinedload(Vehicle.owner), joinedload(Vehicle.stats)
+        ).filter(Vehicle.id == vehicle_id).first()
+        page = keyset_paginate(db.query(Service).filter(Service.vehicle_id == vehicle_id),
+                               [Service.start_date, Service.id], descending=True)
+        return vehicle.owner.name, [s.description for s in page.items]
+    return _session_call(_query)
+
+
+def _show_vehicle_core():
+    from sqlalchemy import select
+    from app.database_models import Client, Service, Vehicle, VehicleServiceStats
+    from app.helpers.pagination import DEFAULT_PAGE_SIZE
+    vehicle_id = _sample_vehicle_id()
+
+    vehicle_statement = (
+        select(Vehicle, Client.name, VehicleServiceStats.service_count)
+        .join(Client, Vehicle.client_id == Client.id)
+        .outerjoin(VehicleServiceStats, VehicleServiceStats.vehicle_id == Vehicle.id)
+        .where(Vehicle.id == vehicle_id)
+    )
+    services_statement = (
+        select(Service.id, Service.description, Service.start_date, Service.status, Service.price)
+        .where(Service.vehicle_id == vehicle_id)
+        .order_by(Service.start_date.desc(), Service.id.desc()).limit(DEFAULT_PAGE_SIZE + 1)
+    )
+    return _session_call(lambda db: (db.execute(vehicle_statement).first(),
+                                     db.execute(services_statement).all()))
+
+
+def _request(path: str):
+    from starlette.requests import Request
+    import main
+    return Request({
+        "type": "http", "method": "GET", "path": path, "root_path": "", "scheme": "http",
+        "query_string": b"", "headers": [(b"host", b"bench")], "server": ("bench", 80),
+        "app": main.app, "router": main.app.router,
+    })
+
+
+def _render_vehicles_list(rows: int):
+    def _setup():
+        # Só o Jinja: os veículos já carregados (com dono e totais)
+        from sqlalchemy.orm import joinedload
+        from app.database import SessionLocal
+        from app.database_models import Vehicle
+        from app.helpers.pagination import keyset_paginate
+        from app.templating import templates
+
+        db = SessionLocal()
+        page = keyset_paginate(
+            db.query(Vehicle).options(joinedload(Vehicle.owner), joinedload(Vehicle.stats)),
+            [Vehicle.model, Vehicle.id], limit=rows
+        )
+        db.close()   # objetos já carregados; renderizar não pode consultar o banco
+        template = templates.get_template("vehicles/list.html")
+        context = {"request": _request("/vehicles/"), "vehicles": page.items, "page": page,
+                   "title": "Lista de Veículos", "username": "bench"}
+        return lambda: template.render(context)
+    return _setup
+
+
+def _route(path: str):
+    def _setup():
+        # A rota inteira (consulta + template), sem o cache de páginas
+        from fastapi.testclient import TestClient
+        import main
+        from app import page_cache
+
+        client = TestClient(main.app)
+        response = client.post("/login", data={"username": "admin", "password": "admin"},
+                               follow_redirects=False)
+        if response.status_code != 303:
+            raise RuntimeError(f"login no banco de teste falhou: HTTP {response.status_code}")
+        resolved = path.format(vehicle_id=_sample_vehicle_id())
+
+        def _get():
+            page_cache.clear()
+            response = client.get(resolved)
+            if response.status_code != 200:
+                raise RuntimeError(f"{resolved}: HTTP {response.status_code}")
+        return _get
+    return _setup
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark("formatters.parse_brl_price[10k]", _formatters_parse),
+    Benchmark("formatters.format_brl_price[10k]", _formatters_format),
+    Benchmark("import.map_vehicle_row[10k]", _import_mapping),
+    # Consultas de menos de 1 ms, templates e rotas completas variam mais
+    # (SQLite, alocação, threadpool, middleware): tolerância maior
+    Benchmark("query.list_vehicles.orm", _list_vehicles_orm, tolerance=0.4),
+    Benchmark("query.list_vehicles.core", _list_vehicles_core, tolerance=0.4),
+    Benchmark("query.show_vehicle.orm", _show_vehicle_orm, tolerance=0.4),
+    Benchmark("query.show_vehicle.core", _show_vehicle_core, tolerance=0.4),
+    Benchmark("render.vehicles_list[50]", _render_vehicles_list(50), tolerance=0.4),
+    Benchmark("render.vehicles_list[200]", _render_vehicles_list(200), tolerance=0.4),
+    Benchmark("route.list_vehicles[200]", _route("/vehicles/?limit=200"), tolerance=0.4),
+    Benchmark("route.show_vehicle", _route("/vehicles/{vehicle_id}"), tolerance=0.4),
+]
+
+
+# --- Execução ---
+
+def prepare_database() -> None:
+    """Banco de teste sempre igual (semente fixa) no arquivo de OFICINA_DB."""
+    from benchmarks.generate_data import generate
+    generate(DATA_CLIENTS, DATA_VEHICLES, DATA_SERVICES, years=3, seed=DATA_SEED)
+
+
+def _calibration():
+    # Trabalho fixo de Python puro (dict, str, int), medido junto de cada amostra
+    counts = {}
+    for i in range(2000):
+        key = f"k{i % 97}"
+        counts[key] = counts.get(key, 0) + len(str(i * 31))
+    return counts
+
+
+def _batch_size(timer: timeit.Timer) -> int:
+    """Operações por amostra para a amostra durar pelo menos MIN_BATCH_SECONDS."""
+    number, elapsed = timer.autorange()
+    if elapsed < MIN_BATCH_SECONDS:
+        number = max(number, int(number * MIN_BATCH_SECONDS / max(elapsed, 1e-9)))
+    return number
+
+
+def measure(benchmark: Benchmark) -> Result:
+    from app.database import engine
+
+    fn = benchmark.setup()
+    fn()  # aquecimento (caches, compilação de templates/SQL)
+    with counting_queries(engine) as counter:
+        fn()
+    timer, calibration = timeit.Timer(fn), timeit.Timer(_calibration)
+    number, calibration_number = _batch_size(timer), _batch_size(calibration)
+
+    def _calibrate() -> float:
+        return calibration.timeit(calibration_number) / calibration_number
+
+    seconds, relative = [], []
+    before = _calibrate()
+    for _ in range(REPEAT):
+        sample = timer.timeit(number) / number
+        after = _calibrate()
+        # A velocidade da máquina varia durante a execução (outros
+        # processos, frequência da CPU): cada amostra é dividida pela
+        # calibração medida logo antes e logo depois dela
+        seconds.append(sample)
+        relative.append(sample / ((before + after) / 2))
+        before = after
+    return Result(benchmark.name, statistics.median(seconds), statistics.median(relative), counter.count)
+
+
+def _tolerance(name: str, default_tolerance: float) -> float:
+    return next((b.tolerance for b in BENCHMARKS if b.name == name and b.tolerance), default_tolerance)
+
+
+def _time_limit(name: str, baseline: dict, default_tolerance: float) -> Optional[float]:
+    """Tempo relativo máximo aceito para o benchmark (None se não está na base)."""
+    base = baseline.get("benchmarks", {}).get(name)
+    if base is None or "relative" not in base:
+        return None
+    return base["relative"] * (1 + _tolerance(name, default_tolerance))
+
+
+def compare(results: List[Result], baseline: dict, default_tolerance: float) -> List[str]:
+    """Lista de regressões (texto) em relação à base."""
+    problems = []
+    for result in results:
+        base = baseline.get("benchmarks", {}).get(result.name)
+        if base is None:
+            continue
+        tolerance = _tolerance(result.name, default_tolerance)
+        limit = _time_limit(result.name, baseline, default_tolerance)
+        if limit is not None and result.relative > limit:
+            problems.append(f"{result.name}: {result.relative / base['relative'] - 1:+.0%} "
+                            f"em relação à base (tolerância {tolerance:.0%}; "
+                            f"{result.seconds * 1000:.3f} ms, base {base['seconds'] * 1000:.3f} ms)")
+        if result.queries > base["queries"]:
+            problems.append(f"{result.name}: {result.queries} comandos SQL (base: {base['queries']})")
+    return problems
+
+
+def _meta() -> dict:
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks com linha de base.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="grava os resultados como nova base")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help=f"fração acima da base tolerada (padrão {DEFAULT_TOLERANCE})")
+    parser.add_argument("--only", help="roda só os benchmarks cujo nome contém este texto")
+    parser.add_argument("--output", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if not args.update_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    tolerance = args.tolerance if args.tolerance is not None else \
+        (baseline or {}).get("tolerance", DEFAULT_TOLERANCE)
+
+    scratch = Path(tempfile.mkdtemp(prefix="oficina_bench_"))
+    # Antes de importar o app: a engine é criada com o caminho do banco
+    os.environ["OFICINA_DB"] = str(scratch / "oficina.db")
+    try:
+        prepare_database()
+        selected = [b for b in BENCHMARKS if not args.only or args.only in b.name]
+        results = []
+        for benchmark in selected:
+            result = measure(benchmark)
+            limit = _time_limit(benchmark.name, baseline, tolerance) if baseline else None
+            for _ in range(RETRIES):
+                if limit is None or result.relative <= limit:
+                    break
+                retry = measure(benchmark)
+                best = min(result, retry, key=lambda r: r.relative)
+                result = Result(result.name, best.seconds, best.relative,
+                                max(result.queries, retry.queries))
+            results.append(result)
+            print(f"{result.name:40s} {result.seconds * 1000:10.3f} ms {result.relative:9.3f}x  "
+                  f"{result.queries:3d} SQL")
+    finally:
+        from app.database import engine
+        engine.dispose()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        "meta": _meta(),
+        "tolerance": tolerance,
+        "benchmarks": {r.name: {"seconds": r.seconds, "relative": r.relative, "queries": r.queries}
+                       for r in results},
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.update_baseline:
+        if args.baseline.exists():
+            # Mantém a base dos benchmarks que não rodaram (--only)
+            previous = json.loads(args.baseline.read_text(encoding="utf-8"))
+            report["benchmarks"] = {**previous.get("benchmarks", {}), **report["benchmarks"]}
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Base gravada em {args.baseline}.")
+        return 0
+
+    if baseline is None:
+        print(f"Sem base em {args.baseline}; rode com --update-baseline.")
+        return 0
+    problems = compare(results, baseline, tolerance)
+    for problem in problems:
+        print(f"REGRESSÃO {problem}")
+    print(f"{len(results)} benchmark(s), {len(problems)} regressão(ões) em relação a {args.baseline.name}.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,14 @@
-import uvicorn
+# Medição da inicialização (ver print_startup_times): começa antes dos imports
+import time
+_STARTED_AT = time.perf_counter()
+_startup_marks = []
+
+def _mark_startup(label: str):
+    _startup_marks.append((label, time.perf_counter()))
+
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.responses import RedirectResponse
+from starlette.responses import RedirectResponse, Response
 from starlette import status as status_codes 
 # --- Importações auxiliares ---
 import sys 
@@ -11,13 +17,23 @@ from pathlib import Path
 
 # --- Importação dos Roteadores ---
 # BANCO DE DADOS
-from app.database import engine, Base
-from app.database_models import User, Client, Vehicle, Service
-from app.auth_utils import create_admin_user_if_not_exists
+from app.database import async_engine, engine, writer_engine
+from app.schema import ensure_schema
+from app.import_jobs import shutdown_import_jobs
+from app.db_writer import db_writer
+from app.assets import CachedStaticFiles
+from app.metrics import (
+    MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, metrics_authorized, render_prometheus, status_info,
+)
+from app.query_stats import QueryStatsMiddleware
+from app.upload_store import PhotoUploadLimitMiddleware
 #----------------------------------------------------------
 from app.routers.clients import router as clients_router 
 from app.routers.vehicles import router as vehicles_router
 from app.routers.services import router as services_router
+from app.routers.search import router as search_router
+from app.routers.imports import router as imports_router
+from app.routers.reports import router as reports_router
 from app.routers import auth
 # ---------------------------------
 
@@ -27,28 +43,65 @@ if getattr(sys, 'frozen', False):
 else:
     BASE_DIR = Path(".") 
 # -------------------------------------------------------------------------------
+_mark_startup("imports")
 
 
 # Cria a instância principal do FastAPI
 app = FastAPI(title="Oficina - Cadastro de Veículos")
-Base.metadata.create_all(bind=engine)
-create_admin_user_if_not_exists()
+# Tabelas, índice de busca e usuário admin: só quando o banco é novo ou de
+# uma versão anterior (PRAGMA user_version); nas outras vezes é uma leitura só
+ensure_schema(engine)
+_mark_startup("banco de dados")
 
 app.add_middleware(
     SessionMiddleware, 
     secret_key="sua-chave-secreta-muito-forte-aqui-123456",
     https_only=False # Em produção, considere True se tiver HTTPS
 )
+# Fotos grandes demais recusadas pelo Content-Length, antes de receber o corpo
+app.add_middleware(PhotoUploadLimitMiddleware)
+# Contagem de SQL por requisição (cabeçalho X-Query-Stats com OFICINA_DEBUG=1)
+app.add_middleware(QueryStatsMiddleware)
+# Adicionado por último = o mais externo: mede também a sessão e os erros
+app.add_middleware(MetricsMiddleware)
+
+# Pools mostrados no /status e no /metrics
+DB_POOLS = {"leitura": engine, "async": async_engine.sync_engine, "escritor": writer_engine}
 
 # Usa o BASE_DIR para montar os caminhos estáticos
-app.mount("/static", StaticFiles(directory=BASE_DIR / "app" / "static"), name="static")
-app.mount("/uploads", StaticFiles(directory=BASE_DIR / "app" / "uploads"), name="uploads")
+# Arquivos com hash no nome (static/dist e as fotos em uploads/blobs) nunca
+# mudam de conteúdo: vão com cache "immutable"; o resto revalida pelo ETag
+app.mount("/static", CachedStaticFiles(directory=BASE_DIR / "app" / "static"), name="static")
+app.mount("/uploads", CachedStaticFiles(directory=BASE_DIR / "app" / "uploads",
+                                        immutable_prefixes=("blobs/",)), name="uploads")
 
 # Inclui os roteadores (ordem não importa)
 app.include_router(auth.router)
 app.include_router(clients_router) 
 app.include_router(vehicles_router)
 app.include_router(services_router) 
+app.include_router(search_router)
+app.include_router(imports_router)
+app.include_router(reports_router)
+_mark_startup("rotas")
+
+# Mostra quanto cada etapa da inicialização levou
+@app.on_event("startup")
+def print_startup_times():
+    _mark_startup("servidor")
+    previous = _STARTED_AT
+    parts = []
+    for label, moment in _startup_marks:
+        parts.append(f"{label} {(moment - previous) * 1000:.0f} ms")
+        previous = moment
+    total = (_startup_marks[-1][1] - _STARTED_AT) * 1000
+    print(f"Inicialização em {total:.0f} ms ({', '.join(parts)})")
+
+# Cancela as importações em andamento e esvazia a fila de escrita ao desligar
+@app.on_event("shutdown")
+def stop_background_workers():
+    shutdown_import_jobs()
+    db_writer.stop()
 
 # Rota de redirecionamento para a lista de veículos
 @app.get("/", include_in_schema=False)
@@ -67,7 +120,19 @@ def status(request: Request):
         "port": request.url.port or 80,
         "scheme": request.url.scheme,
         "path": request.url.path,
+        **status_info(DB_POOLS),
     }
 
+# Métricas por rota no formato do Prometheus. 'async def': roda no event
+# loop, o mesmo onde o MetricsMiddleware registra (sem lock).
+# Só com login ou com o token do coletor (OFICINA_METRICS_TOKEN)
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not metrics_authorized(request):
+        return Response(status_code=status_codes.HTTP_401_UNAUTHORIZED,
+                        headers={"WWW-Authenticate": "Bearer"})
+    return Response(render_prometheus(DB_POOLS), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
+    import uvicorn  # só para rodar direto; não pesa em quem importa 'main'
     uvicorn.run(app, host="127.0.0.1", port=8000)